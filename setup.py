@@ -10,6 +10,7 @@ setup(
 	author_email='doug.p.lau@gmail.com',
 	description='Program to reformat SVG image files',
 	packages=['svgclean'],
+	package_data={'svgclean': ['namespaces.ini']},
 	data_files=[('/usr/share/svgclean',
 		['ChangeLog', 'COPYING', 'TODO']
 	)],
@@ -0,0 +1,312 @@
+#
+#   svgclean/bbox.py
+#
+#   This is a module to calculate bounding boxes of SVG elements.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+import re
+from math import sqrt, sin, cos, atan2, pi
+from . import curve
+from . import path
+from . import points
+
+_LENGTH = re.compile(
+	r'^\s*([+-]?(\d+\.\d*|\d*\.\d+|\d+)([eE][+-]?\d+)?)\s*([a-z]*)\s*$')
+
+# User units for each absolute length unit (90 dpi)
+_UNITS = {
+	'': 1.0,
+	'px': 1.0,
+	'pt': 1.25,
+	'pc': 15.0,
+	'mm': 3.543307,
+	'cm': 35.43307,
+	'in': 90.0,
+}
+
+def parse_length(value):
+	'Parse a length in user units, or None for relative units'
+	m = _LENGTH.match(value)
+	if m and m.group(4) in _UNITS:
+		return float(m.group(1)) * _UNITS[m.group(4)]
+
+class Bounds(object):
+
+	def __init__(self):
+		self.xmin = None
+		self.ymin = None
+		self.xmax = None
+		self.ymax = None
+
+	def is_empty(self):
+		return self.xmin is None
+
+	def add_point(self, x, y):
+		if self.xmin is None:
+			self.xmin = self.xmax = x
+			self.ymin = self.ymax = y
+		else:
+			self.xmin = min(self.xmin, x)
+			self.xmax = max(self.xmax, x)
+			self.ymin = min(self.ymin, y)
+			self.ymax = max(self.ymax, y)
+
+	def add_x(self, x):
+		self.xmin = min(self.xmin, x)
+		self.xmax = max(self.xmax, x)
+
+	def add_y(self, y):
+		self.ymin = min(self.ymin, y)
+		self.ymax = max(self.ymax, y)
+
+	def inflate(self, d):
+		if not self.is_empty():
+			self.xmin -= d
+			self.ymin -= d
+			self.xmax += d
+			self.ymax += d
+
+	def intersects(self, other):
+		if self.is_empty() or other.is_empty():
+			return False
+		return self.xmin <= other.xmax and other.xmin <= self.xmax \
+		   and self.ymin <= other.ymax and other.ymin <= self.ymax
+
+	def __str__(self):
+		return 'Bounds(%s %s %s %s)' % (self.xmin, self.ymin,
+			self.xmax, self.ymax)
+
+def _cubic_roots(v0, v1, v2, v3):
+	'Get curve parameters of extrema on one axis of a cubic curve'
+	a = -v0 + 3.0 * v1 - 3.0 * v2 + v3
+	b = 2.0 * (v0 - 2.0 * v1 + v2)
+	c = v1 - v0
+	if abs(a) < 1.0e-12:
+		if abs(b) < 1.0e-12:
+			return ()
+		return (-c / b,)
+	disc = b * b - 4.0 * a * c
+	if disc < 0:
+		return ()
+	s = sqrt(disc)
+	return ((-b + s) / (2.0 * a), (-b - s) / (2.0 * a))
+
+def _cubic_value(v0, v1, v2, v3, t):
+	s = 1.0 - t
+	return s * s * s * v0 + 3.0 * s * s * t * v1 + \
+	       3.0 * s * t * t * v2 + t * t * t * v3
+
+def _add_cubic(b, p0, p1, p2, p3):
+	b.add_point(*p0)
+	b.add_point(*p3)
+	for t in _cubic_roots(p0[0], p1[0], p2[0], p3[0]):
+		if 0 < t < 1:
+			b.add_x(_cubic_value(p0[0], p1[0], p2[0], p3[0], t))
+	for t in _cubic_roots(p0[1], p1[1], p2[1], p3[1]):
+		if 0 < t < 1:
+			b.add_y(_cubic_value(p0[1], p1[1], p2[1], p3[1], t))
+
+def _add_quadratic(b, p0, p1, p2):
+	b.add_point(*p0)
+	b.add_point(*p2)
+	for i, add in ((0, b.add_x), (1, b.add_y)):
+		d = p0[i] - 2.0 * p1[i] + p2[i]
+		if abs(d) > 1.0e-12:
+			t = (p0[i] - p1[i]) / d
+			if 0 < t < 1:
+				s = 1.0 - t
+				add(s * s * p0[i] + 2.0 * s * t * p1[i] +
+				    t * t * p2[i])
+
+def _in_sweep(theta, theta1, dtheta):
+	if dtheta >= 0:
+		return (theta - theta1) % (2 * pi) <= dtheta
+	else:
+		return (theta1 - theta) % (2 * pi) <= -dtheta
+
+def _add_ellipse(b, cx, cy, rx, ry, phi, theta1, dtheta, mtx):
+	'Add an elliptical arc (center parameterization) to bounds'
+	a, bb, c, d, e, f = mtx.m
+	cp = cos(phi)
+	sp = sin(phi)
+	# Transformed ellipse: x = x0 + ax * cos(t) + bx * sin(t), etc.
+	x0, y0 = mtx.transform_point(cx, cy)
+	ax = a * rx * cp + c * rx * sp
+	bx = -a * ry * sp + c * ry * cp
+	ay = bb * rx * cp + d * rx * sp
+	by = -bb * ry * sp + d * ry * cp
+	for t in (theta1, theta1 + dtheta):
+		b.add_point(x0 + ax * cos(t) + bx * sin(t),
+		            y0 + ay * cos(t) + by * sin(t))
+	for t in (atan2(bx, ax), atan2(bx, ax) + pi):
+		if _in_sweep(t, theta1, dtheta):
+			b.add_x(x0 + ax * cos(t) + bx * sin(t))
+	for t in (atan2(by, ay), atan2(by, ay) + pi):
+		if _in_sweep(t, theta1, dtheta):
+			b.add_y(y0 + ay * cos(t) + by * sin(t))
+
+def _add_arc(b, p0, values, mtx):
+	'Add an arc (endpoint parameterization) to bounds'
+	arc = curve.arc_center(p0, values)
+	if arc is None:
+		b.add_point(*mtx.transform_point(*p0))
+		b.add_point(*mtx.transform_point(values[5], values[6]))
+	else:
+		_add_ellipse(b, *(arc + (mtx,)))
+
+def path_bounds(geometry, mtx):
+	'Get the bounds of path geometry'
+	b = Bounds()
+	pen = start = path.PathCommand.ORIGIN
+	tp = mtx.transform_point
+	for letter, pts in path.split_values(geometry):
+		if letter == 'M':
+			start = pen = (pts[0], pts[1])
+			b.add_point(*tp(*pen))
+		elif letter == 'Z':
+			pen = start
+		elif letter == 'H':
+			pen = (pts[0], pen[1])
+			b.add_point(*tp(*pen))
+		elif letter == 'V':
+			pen = (pen[0], pts[0])
+			b.add_point(*tp(*pen))
+		elif letter == 'L':
+			pen = (pts[0], pts[1])
+			b.add_point(*tp(*pen))
+		elif letter == 'C':
+			p3 = (pts[4], pts[5])
+			_add_cubic(b, tp(*pen), tp(pts[0], pts[1]),
+				tp(pts[2], pts[3]), tp(*p3))
+			pen = p3
+		elif letter == 'Q':
+			p2 = (pts[2], pts[3])
+			_add_quadratic(b, tp(*pen), tp(pts[0], pts[1]),
+				tp(*p2))
+			pen = p2
+		elif letter == 'A':
+			_add_arc(b, pen, pts, mtx)
+			pen = (pts[5], pts[6])
+	return b
+
+def points_bounds(pts, mtx):
+	'Get the bounds of a points attribute'
+	b = Bounds()
+	values = points.SPLIT_RE.split(pts.strip())
+	for i in range(0, len(values) - 1, 2):
+		b.add_point(*mtx.transform_point(float(values[i]),
+			float(values[i + 1])))
+	return b
+
+def rect_bounds(x, y, width, height, mtx):
+	'Get the bounds of a rectangle'
+	b = Bounds()
+	for px, py in ((x, y), (x + width, y), (x, y + height),
+	               (x + width, y + height)):
+		b.add_point(*mtx.transform_point(px, py))
+	return b
+
+def ellipse_bounds(cx, cy, rx, ry, mtx):
+	'Get the bounds of an ellipse'
+	b = Bounds()
+	_add_ellipse(b, cx, cy, rx, ry, 0, 0, 2 * pi, mtx)
+	return b
+
+def line_bounds(x1, y1, x2, y2, mtx):
+	'Get the bounds of a line'
+	b = Bounds()
+	b.add_point(*mtx.transform_point(x1, y1))
+	b.add_point(*mtx.transform_point(x2, y2))
+	return b
+
+def _lengths(attrs, names):
+	values = []
+	for name, default in names:
+		v = parse_length(attrs.get(name, default))
+		if v is None:
+			raise ValueError(name)
+		values.append(v)
+	return values
+
+def element_bounds(name, attrs, mtx):
+	'Get the bounds of an element, or None if not known'
+	try:
+		if name == 'path':
+			return path_bounds(attrs['d'], mtx)
+		elif name in ('polygon', 'polyline'):
+			return points_bounds(attrs['points'], mtx)
+		elif name in ('rect', 'image'):
+			x, y, w, h = _lengths(attrs, (('x', '0'),
+				('y', '0'), ('width', ''), ('height', '')))
+			return rect_bounds(x, y, w, h, mtx)
+		elif name == 'circle':
+			cx, cy, r = _lengths(attrs, (('cx', '0'),
+				('cy', '0'), ('r', '')))
+			return ellipse_bounds(cx, cy, r, r, mtx)
+		elif name == 'ellipse':
+			cx, cy, rx, ry = _lengths(attrs, (('cx', '0'),
+				('cy', '0'), ('rx', ''), ('ry', '')))
+			return ellipse_bounds(cx, cy, rx, ry, mtx)
+		elif name == 'line':
+			x1, y1, x2, y2 = _lengths(attrs, (('x1', '0'),
+				('y1', '0'), ('x2', '0'), ('y2', '0')))
+			return line_bounds(x1, y1, x2, y2, mtx)
+	except (KeyError, ValueError, path.InvalidPathError):
+		return None
+
+def stroke_extent(style, mtx):
+	'Get the distance a stroke can extend past geometry, if known'
+	if style.get_prop('stroke') in (None, 'none'):
+		return 0.0
+	width = parse_length(style.get_prop('stroke-width') or '1')
+	if width is None:
+		return None
+	factor = sqrt(2.0)
+	if style.get_prop('stroke-linejoin') == 'miter':
+		limit = parse_length(style.get_prop('stroke-miterlimit') or '4')
+		factor = max(factor, limit or 4.0)
+	a, b, c, d, e, f = mtx.m
+	return width / 2.0 * factor * sqrt(a * a + b * b + c * c + d * d)
+
+def viewport(attrs):
+	'Get the viewport bounds of a root svg element'
+	width = parse_length(attrs.get('width', ''))
+	height = parse_length(attrs.get('height', ''))
+	view = points.SPLIT_RE.split(attrs.get('viewBox', '').strip())
+	if len(view) == 4:
+		try:
+			x, y, w, h = [float(v) for v in view]
+		except ValueError:
+			return None
+		if w <= 0 or h <= 0:
+			return None
+		align = attrs.get('preserveAspectRatio', '').split()
+		if width and height and not (align and align[0] == 'none'):
+			# Content outside the viewBox can show when the
+			# aspect ratio does not match the viewport
+			s = min(width / w, height / h)
+			dw = width / s - w
+			dh = height / s - h
+			x -= dw
+			y -= dh
+			w += 2 * dw
+			h += 2 * dh
+		b = Bounds()
+		b.add_point(x, y)
+		b.add_point(x + w, y + h)
+		return b
+	elif width and height:
+		b = Bounds()
+		b.add_point(0, 0)
+		b.add_point(width, height)
+		return b
@@ -17,12 +17,24 @@
 
 from xml.parsers.expat import ParserCreate, ExpatError
 from .format import Formatter
+import os.path
 import sys
 from . import style
+from . import props
 from . import transform
 from . import path
 from . import points
 from . import namespace
+from . import reuse
+from . import bbox
+from . import merge
+from . import flatten
+from . import css
+from . import palette
+from . import tree
+from . import refs
+from . import collapse
+from . import passes
 
 UTF8_ENCODING = 'UTF-8'
 NAMESPACE = 'http://www.w3.org/2000/svg'
@@ -31,6 +43,14 @@ SYSTEM_ID_10 = 'http://www.w3.org/TR/2001/REC-SVG-20010904/DTD/svg10.dtd'
 PUBLIC_ID_11 = '-//W3C//DTD SVG 1.1//EN'
 SYSTEM_ID_11 = 'http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd'
 
+# Elements which are not rendered in the coordinates of their parent
+_DEFINITIONS = ('defs', 'clipPath', 'mask', 'marker', 'pattern', 'symbol',
+	'linearGradient', 'radialGradient', 'filter', 'svg', 'switch')
+
+# Styles which can render outside the bounds of an element
+_OVERFLOW_STYLES = ('marker', 'marker-start', 'marker-mid', 'marker-end',
+	'filter')
+
 class InvalidDocTypeError(Exception):
 	pass
 
@@ -40,12 +60,24 @@ class UnknownNamespaceError(Exception):
 class SvgCleaner(object):
 
 	def __init__(self, options):
-		self.parser = ParserCreate()
+		if options.expat:
+			self.spaces = namespace.ExpatNamespaces()
+			self.parser = ParserCreate(
+				namespace_separator=namespace.SEPARATOR)
+			self.parser.StartNamespaceDeclHandler = \
+				self.spaces.start_decl
+			self.parser.EndNamespaceDeclHandler = \
+				self.spaces.end_decl
+			self.parser.StartElementHandler = self.start_element_ns
+			self.parser.EndElementHandler = self.end_element_ns
+		else:
+			self.spaces = namespace.DeclaredNamespaces()
+			self.parser = ParserCreate()
+			self.parser.StartElementHandler = self.start_element
+			self.parser.EndElementHandler = self.end_element
 		self.parser.XmlDeclHandler = self.xml_decl
 		self.parser.StartDoctypeDeclHandler = self.start_doctype_decl
 		self.parser.CommentHandler = self.comment
-		self.parser.StartElementHandler = self.start_element
-		self.parser.EndElementHandler = self.end_element
 		self.parser.CharacterDataHandler = self.character_data
 		self.parser.StartCdataSectionHandler = self.start_cdata_section
 		self.parser.EndCdataSectionHandler = self.end_cdata_section
@@ -55,9 +87,30 @@ class SvgCleaner(object):
 		self.open_tag = False
 		self.format = Formatter(self.options.indent)
 		self.discard = []
-		self.spaces = namespace.DeclaredNamespaces()
+		self.names = []
 		self.styles = [style.ROOT]
+		self.interned = {}
 		self.matrices = [transform.Matrix()]
+		self.reuse = None
+		self.viewport = None
+		self.group = None
+		self.pending = None
+		self.groups = None
+		self.css = None
+		self.palette = None
+		self.rules = None
+		self.sheets = 0
+		self.in_sheet = False
+		self.pushed = [transform.Matrix()]
+		self.refs = None
+		self.unused_defs = set()
+		self.index = None
+		self.children = None
+		self.animations = None
+		self.pinned = []
+		self.held = []
+		self.unwrapped = []
+		self.pipeline = passes.Pipeline()
 
 	def warn(self, msg):
 		if self.options.verbose:
@@ -67,30 +120,35 @@ class SvgCleaner(object):
 		print(msg.encode('utf_8'), file=sys.stderr)
 
 	def add_token(self, token):
-		if self.open_tag:
-			self.format.end_block('>')
-			self.open_tag = False
+		self.release_held()
+		self.close_open_tag(len(self.names))
 		self.format.begin_block('', '')
 		self.format.write(token)
 		self.format.end_block(None)
 
 	def write_attribute(self, elem, attr, value):
 		token = "%s='" % attr
+		value = self.pipeline.attribute(self, elem, attr, value)
 		if attr == 'id' and elem != 'svg':
-			if not self.options.attrib:
+			if not self.options.attrib or self._is_referenced(value):
 				self.format.begin_block(token, '')
 				self.format.write(value)
 				self.format.end_block("'")
 		elif attr == 'd':
+			try:
+				tokens = list(path.split_tokens(value, self.options,
+					self.matrices[-1]))
+			except (ValueError, path.InvalidPathError):
+				self.warn('Invalid path: %s' % value)
+				tokens = [value]
 			self.format.begin_block(token, '')
-			for v in path.split_tokens(value, self.options,
-			    self.matrices[-1]):
+			for v in tokens:
 				self.format.write(v)
 			self.format.end_block("'")
 		elif attr == 'points':
 			self.format.begin_block(token, '')
 			for v in points.split_tokens(value, self.options,
-			    self.matrices[-1]):
+			    self.matrices[-1], elem == 'polygon'):
 				self.format.write(v)
 			self.format.end_block("'")
 		elif attr == 'style':
@@ -103,17 +161,16 @@ class SvgCleaner(object):
 			self.format.write(value)
 			self.format.end_block("'")
 
-	def write_attributes(self, elem, attrs):
-		for level in self.spaces.stack:
-			for ns in list(level.values()):
-				for ca in ns.customary_attribs():
-					if ca in attrs:
-						self.write_attribute(elem, ca,
-							attrs[ca])
-						del attrs[ca]
-		for a in attrs:
-			self.warn('Discarding attribute: %s="%s"' % (a,
-				attrs[a]))
+	def write_attributes(self, elem, attrs, context=None):
+		if context is None:
+			context = self.spaces.context()
+		for a in context.ordered_attribs(attrs):
+			self.write_attribute(elem, a, attrs.pop(a))
+		if self.options.verbose and not self.discard:
+			for a in attrs:
+				if not context.is_stripped(a):
+					self.warn('Discarding attribute: %s="%s"'
+						% (a, attrs[a]))
 
 	def xml_decl(self, version, encoding, standalone):
 		if encoding is None:
@@ -159,117 +216,381 @@ class SvgCleaner(object):
 			if attrs['xmlns'].lower() != NAMESPACE:
 				raise UnknownNamespaceError(attrs['xmlns'])
 
+	def check_viewport(self, attrs):
+		if self.options.cull and not self.names:
+			self.viewport = bbox.viewport(attrs)
+
 	def comment(self, data):
 		if not self.options.comments:
+			self.release_pending()
+			self.flush_group()
 			self.add_token('<!--%s-->' % data)
 
 	def start_cdata_section(self):
+		if self.in_sheet:
+			return
+		self.release_pending()
+		self.flush_group()
 		self.add_token('<![CDATA[')
 
 	def end_cdata_section(self):
-		self.format.write(']]>')
+		if not self.in_sheet:
+			self.format.write(']]>')
 
 	def character_data(self, data):
 		data = data.strip()
-		if data:
+		if data and not self.in_sheet:
+			self.release_pending()
+			self.flush_group()
 			self.add_token(data)
 
-	def process_style(self, attrs):
-		s = style.Style(self.styles[-1], attrs)
-		self.styles.append(s)
-		if self.options.style:
+	def intern_style(self, parent, raw, width, presentation=None):
+		if presentation is None:
+			presentation = self.options.presentation
+		key = (parent, raw, width, self.options.style, presentation)
+		entry = self.interned.get(key)
+		if entry is None:
+			s = style.Style(parent, dict(raw))
+			if self.palette:
+				s.replace_props(palette.STYLES,
+					self.palette.lookup)
+			if width is not None:
+				s.set_prop('stroke-width', width)
+			if self.options.style:
+				s.normalize()
+				s.compress(self.options.verbose)
+			out = {}
+			if presentation == style.SHORTEST:
+				s.set_shortest_attributes(out)
+			elif presentation:
+				s.set_presentation_attributes(out)
+			else:
+				s.set_inline_style(out)
+			entry = (s, tuple(out.items()))
+			if len(self.interned) >= style.INTERN_SIZE:
+				self.interned.clear()
+			self.interned[key] = entry
+		return entry
+
+	def intern_rules(self, parent, decls):
+		key = (parent, decls)
+		s = self.interned.get(key)
+		if s is None:
+			s = style.Style(parent, dict(decls), True)
 			s.normalize()
-			s.compress(self.options.verbose)
-		if self.options.presentation:
-			s.set_presentation_attributes(attrs)
-		else:
-			s.set_inline_style(attrs)
+			self.interned[key] = s
+		return s
+
+	def process_style(self, name, attrs):
+		parent = self.styles[-1]
+		raw = style.split_input(attrs)
+		presentation = None
+		if self.rules:
+			decls = self.rules.match(name, attrs)
+			if decls:
+				# Style rules override presentation attributes
+				parent = self.intern_rules(parent, decls)
+				declared = dict(decls)
+				raw = tuple((p, v) for p, v in raw
+					if p == 'style' or p not in declared)
+				presentation = False
+		s, out = self.intern_style(parent, raw, None, presentation)
+		if self.groups:
+			width = self.push_group_transform(name, attrs, s)
+			if width is not None:
+				s, out = self.intern_style(parent, raw, width,
+					presentation)
+		self.styles.append(s)
+		attrs.update(out)
+		if self.css and 'style' in attrs and 'class' not in attrs:
+			c = self.css.lookup(attrs['style'])
+			if c is not None:
+				del attrs['style']
+				attrs['class'] = c
+
+	def push_group_transform(self, name, attrs, s):
+		b = self.pushed[-1]
+		try:
+			return self._push_group_transform(name, attrs, s, b)
+		except transform.InvalidTransformError:
+			self.warn('Invalid transform: %s' % attrs['transform'])
+			self.pushed.append(transform.Matrix())
+
+	def _push_group_transform(self, name, attrs, s, b):
+		if name.split(':')[-1] == 'g':
+			if 'transform' not in attrs:
+				self.pushed.append(b)
+				return
+			m = transform.parse(b, attrs)
+			index = self._byte_index()
+			req = self.groups.get_requirements(index)
+			if flatten.satisfies(req, m.m):
+				del attrs['transform']
+				self.pushed.append(m)
+				return
+		elif not b.is_identity():
+			m = transform.parse(b, attrs)
+			req = flatten.requirements(name, attrs, s)
+			if flatten.satisfies(req, m.m):
+				self.pushed.append(transform.Matrix())
+				return flatten.absorb(name, attrs, s, m)
+		if not b.is_identity():
+			attrs['transform'] = str(m)
+		self.pushed.append(transform.Matrix())
+
+	def write_stylesheet_link(self):
+		if self.css and self.options.css and not self.names:
+			self.format.begin_block('<?xml-stylesheet ', ' ')
+			self.write_attribute('xml-stylesheet', 'type', 'text/css')
+			self.write_attribute('xml-stylesheet', 'href',
+				self._stylesheet_href())
+			self.format.end_block('?>')
+
+	def _stylesheet_href(self):
+		'Get the link to a shared stylesheet, relative to the output'
+		out = self.options.out_file
+		if not out:
+			return self.options.css
+		href = os.path.relpath(self.options.css,
+			os.path.dirname(out) or os.curdir)
+		return href.replace(os.sep, '/')
+
+	def write_stylesheet(self):
+		if self.css and not self.options.css and len(self.names) == 1:
+			text = self.css.text()
+			if '<' in text or '&' in text:
+				text = '<![CDATA[%s]]>' % text
+			depth = len(self.names)
+			self.names.append('style')
+			self.write_start('style', {'type': 'text/css'}, depth)
+			self.add_token(text)
+			self.names.pop()
+			self.write_end('style', 'style')
+
+	def _tracks_transform(self):
+		return self.options.transform or self.options.cull
 
 	def process_transform(self, attrs):
-		m = transform.parse(self.matrices[-1], attrs)
+		try:
+			m = transform.parse(self.matrices[-1], attrs)
+		except transform.InvalidTransformError:
+			# Renderers ignore an invalid transform
+			self.warn('Invalid transform: %s' % attrs['transform'])
+			self.matrices.append(self.matrices[-1])
+			return
 		self.matrices.append(m)
+		if self.options.transform:
+			attrs.pop('transform', None)
+
+	def _is_selected(self, ident):
+		return self.rules is not None and ident in self.rules.ids
+
+	def write_sheet(self):
+		if self.rules and self.options.style:
+			self.add_token(css.text_token(
+				self.rules.minify(self.sheets)))
+			self.in_sheet = True
+		self.sheets += 1
+
+	def _is_referenced(self, ident):
+		'Check if an id is (or might be) referenced'
+		return self.refs is None or ident in self.refs or \
+		       self._is_reused(ident) or self._is_selected(ident)
+
+	def _is_reused(self, ident):
+		return self.reuse is not None and self.reuse.is_defined(ident)
+
+	def check_reuse_namespace(self, attrs):
+		if self.reuse and self.reuse.defs and not self.names:
+			if 'xmlns:xlink' not in attrs:
+				self.spaces.declare(attrs, namespace.XLINK)
+
+	def write_reuse_defs(self):
+		if self.reuse and self.reuse.defs and len(self.names) == 1:
+			self.start_element('defs', {})
+			for ident, d in self.reuse.definitions():
+				self.start_element('path', {'id': ident, 'd': d})
+				self.end_element('path')
+			self.end_element('defs')
 
 	def push_discard(self, name):
 		self.warn('Discarding element: %s' % name)
-		self.discard.append(name)
+		self.discard.append(len(self.names))
 		self.format.set_discard(True)
 
-	def pop_discard(self, name):
-		d = self.discard.pop(-1)
-		if d != name:
-			self.error('Discard problem: %s != %s' % (name, d))
-			sys.exit(1)
+	def pop_discard(self):
+		self.discard.pop()
 		if not self.discard:
 			self.format.set_discard(False)
 
-	def adjust_name(self, name, attrs):
-		if self.options.prefix:
-			name = self.spaces.get_customary_name(name)
-		if self.options.poly and name == 'polygon':
-			if attrs:
-				pts = attrs.pop('points')
-				attrs['d'] = points.convert_to_path(pts, True)
-			return 'path'
-		elif self.options.poly and name == 'polyline':
-			if attrs:
-				pts = attrs.pop('points')
-				attrs['d'] = points.convert_to_path(pts, False)
-			return 'path'
-		elif self.options.basic and name == 'line':
-			if attrs:
-				pts = ' '.join([attrs.pop('x1'),
-					attrs.pop('y1'), attrs.pop('x2'),
-					attrs.pop('y2')])
-				attrs['d'] = points.convert_to_path(pts, False)
-			return 'path'
-		elif self.options.basic and name == 'rect':
-			# FIXME: does not work with rx, ry attributes
-			if attrs:
-				x = attrs.pop('x', '0')
-				y = attrs.pop('y', '0')
-				width = attrs.pop('width')
-				height = attrs.pop('height')
-				xw = str(float(x) + float(width))
-				yh = str(float(y) + float(height))
-				pts = ' '.join([x, y, x, yh, xw, yh, xw, y])
-				attrs['d'] = points.convert_to_path(pts, True)
-			return 'path'
-		else:
-			return name
+	def skip_start(self, name):
+		'Enter an element within a discarded subtree'
+		self.spaces.enter({})
+		self.styles.append(self.styles[-1])
+		if self.groups:
+			self.pushed.append(self.pushed[-1])
+		if self._tracks_transform():
+			self.matrices.append(self.matrices[-1])
+		self.names.append(name)
+		if name.split(':')[-1] == 'style':
+			self.sheets += 1
+
+	def skip_end(self):
+		'Leave an element within a discarded subtree'
+		self.names.pop()
+		self.styles.pop()
+		if self.groups:
+			self.pushed.pop()
+		if self._tracks_transform():
+			self.matrices.pop()
+		self.spaces.exit()
 
 	def _should_discard(self, name):
 		return (self.options.namespace and not
 		        self.spaces.is_element_valid(name)) or \
-		       (self.options.foreign and name == 'foreignObject')
+		       (self.options.foreign and name == 'foreignObject') or \
+		       self._is_unused_def()
 
-	def start_element(self, name, attrs):
-		self.check_doctype_defined()
-		self.spaces.enter(attrs)
+	def _byte_index(self):
+		if self.index is not None:
+			return self.index
+		return self.parser.CurrentByteIndex
+
+	def _is_unused_def(self):
+		return self.unused_defs and \
+		       self._byte_index() in self.unused_defs
+
+	def _in_definition(self):
+		for n in self.names[1:]:
+			if n.split(':')[-1] in _DEFINITIONS:
+				return True
+		return False
+
+	def _is_pinned(self, attrs):
+		'''Check if the content of an element must not be culled, since
+		it is animated or referenced (and could be drawn elsewhere)'''
+		if not self.options.cull:
+			return False
+		if 'id' in attrs and self._is_referenced(attrs['id']):
+			return True
+		return self.animations is not None and \
+		       self.animations.is_animated(self._byte_index())
+
+	def _is_culled(self, name, attrs):
+		if self.discard or not (self.options.cull and self.viewport):
+			return False
+		# Animations or references could draw elements in the viewport
+		if 'id' in attrs or self.pinned or self._in_definition():
+			return False
+		s = self.styles[-1]
+		for p in _OVERFLOW_STYLES:
+			if s.get_prop(p) not in (None, 'none'):
+				return False
+		# Filters of ancestors could also move elements
+		for a in self.styles[:-1]:
+			if a.get_prop('filter') not in (None, 'none'):
+				return False
+		m = self.matrices[-1]
+		b = bbox.element_bounds(name, attrs, m)
+		w = bbox.stroke_extent(s, m)
+		if b is None or w is None:
+			return False
+		b.inflate(w)
+		return not b.intersects(self.viewport)
+
+	def merge_path(self, name, attrs):
+		if not self.options.merge or self.discard:
+			return False
+		if not merge.is_candidate(name, attrs, self.styles[-1]):
+			return False
+		depth = len(self.names)
+		m = self.matrices[-1]
+		if self.group and not self.group.accepts(attrs, depth, m):
+			self.flush_group()
+		if self.group is None:
+			self.group = merge.PathGroup(dict(attrs),
+				self.styles[-1], depth, m)
+		self.pending = attrs
+		return True
+
+	def release_pending(self):
+		attrs = self.pending
+		if attrs is not None:
+			self.pending = None
+			self.flush_group()
+			self.write_start('path', attrs, len(self.names) - 1)
+
+	def flush_group(self):
+		g = self.group
+		if g is not None:
+			self.group = None
+			if g.parts:
+				g.attrs['d'] = g.geometry()
+				self.matrices.append(g.mtx)
+				self.write_start('path', g.attrs, g.depth)
+				self.matrices.pop()
+				self.write_end('path', 'path')
+
+	def end_pending(self):
+		self.group.add(self.pending['d'])
+		self.pending = None
+
+	def close_open_tag(self, depth):
 		if self.open_tag:
 			self.format.end_block('>')
-			if len(self.styles) > 2:
+			self.open_tag = False
+			if self.unwrapped:
+				depth -= sum(1 for u in self.unwrapped
+					if u[0] < depth)
+			if depth > 1:
 				self.format.begin_block('\t', '\n')
-		if self._should_discard(name):
-			self.push_discard(name)
-		name = self.adjust_name(name, attrs)
-		if name == 'style' and self.options.style:
-			self.warn('Stylesheet declared: '
-			          'Style compression disabled')
-			self.options.style = False
+
+	def write_start(self, name, attrs, depth, context=None):
+		self.release_held()
+		self.close_open_tag(depth)
 		self.format.begin_block('<%s ' % name, '\n')
-		if name == 'svg':
-			self.check_namespace(attrs)
-		self.process_style(attrs)
-		if self.options.transform:
-			self.process_transform(attrs)
-		self.write_attributes(name, attrs)
+		self.write_attributes(name, attrs, context)
 		self.open_tag = True
 
-	def end_element(self, name):
-		self.styles.pop()
-		if self.options.transform:
-			self.matrices.pop()
-		n = self.adjust_name(name, None)
+	def _is_held(self, name, attrs):
+		'Check if an element start tag should be held until content'
+		if not self.options.elements or not self.names:
+			return False
+		if name.split(':')[-1] not in collapse.CONTAINERS:
+			return False
+		return 'id' not in attrs or not self._is_referenced(attrs['id'])
+
+	def release_held(self):
+		'Write start tags which were held, now that they have content'
+		if self.held and not self.discard:
+			held = self.held
+			self.held = []
+			for depth, name, attrs, context in held:
+				self.write_start(name, attrs, depth, context)
+
+	def _unwrap(self, name, attrs):
+		'''Check if a group can be unwrapped, returning its style
+		declarations and transform'''
+		if not (self.children and name == 'g' and
+		        self.children.is_single(self._byte_index())):
+			return None
+		decls = self.styles[-1].declared_props()
+		if not collapse.is_inherited(decls):
+			return None
+		xform = attrs.get('transform')
+		if xform is not None and (self._tracks_transform() or
+		   self.groups):
+			return None
+		for a in self.spaces.context().ordered_attribs(attrs):
+			if a == 'id':
+				if self._is_referenced(attrs[a]):
+					return None
+			elif a not in ('style', 'transform') and \
+			     a not in props.REGISTRY:
+				return None
+		return (decls, xform)
+
+	def write_end(self, name, n):
 		if self.open_tag:
 			self.format.end_block('/>')
 			self.open_tag = False
@@ -277,8 +598,102 @@ class SvgCleaner(object):
 			if name != 'svg':
 				self.format.end_block(None)
 			self.format.write('</%s>' % n)
-		if self._should_discard(name):
-			self.pop_discard(name)
+
+	def start_element(self, name, attrs):
+		if self.discard:
+			self.skip_start(name)
+			return
+		self.check_doctype_defined()
+		self.release_pending()
+		if name == 'svg':
+			self.check_reuse_namespace(attrs)
+		self.spaces.enter(attrs)
+		if self.unwrapped and \
+		   self.unwrapped[-1][0] == len(self.names) - 1:
+			collapse.inherit(attrs, *self.unwrapped[-1][1:])
+		discard = self._should_discard(name)
+		name = self.pipeline.start_element(passes.RENAME, self, name,
+			attrs)
+		if name == 'svg':
+			self.check_namespace(attrs)
+			self.check_viewport(attrs)
+		self.process_style(name, attrs)
+		if self._tracks_transform():
+			self.process_transform(attrs)
+		name = self.pipeline.start_element(passes.CONVERT, self, name,
+			attrs)
+		depth = len(self.names)
+		if self._is_pinned(attrs):
+			self.pinned.append(depth)
+		if discard or self._is_culled(name, attrs):
+			self.flush_group()
+			if self.held:
+				self.close_open_tag(self.held[0][0])
+			else:
+				self.close_open_tag(depth)
+			self.push_discard(name)
+		elif self.merge_path(name, attrs):
+			self.names.append(name)
+			return
+		else:
+			self.flush_group()
+		if name == 'svg':
+			self.write_stylesheet_link()
+		self.names.append(name)
+		if not self.discard:
+			unwrap = self._unwrap(name, attrs)
+			if unwrap is not None:
+				self.warn('Unwrapping group')
+				self.unwrapped.append((depth,) + unwrap)
+				# Children inherit from the parent of the group
+				self.styles[-1] = self.styles[-2]
+				return
+			if self._is_held(name, attrs):
+				self.held.append((depth, name, attrs,
+					self.spaces.context()))
+				return
+		self.write_start(name, attrs, depth)
+		if name == 'svg':
+			self.write_stylesheet()
+			self.write_reuse_defs()
+		elif name.split(':')[-1] == 'style':
+			self.write_sheet()
+
+	def start_element_ns(self, name, attrs):
+		self.start_element(self.spaces.qualify(name),
+			self.spaces.qualify_attrs(attrs))
+
+	def end_element_ns(self, name):
+		self.end_element(self.spaces.qualify(name))
+
+	def end_element(self, name):
+		if self.discard and self.discard[-1] < len(self.names) - 1:
+			self.skip_end()
+			return
+		self.styles.pop()
+		if self.groups:
+			self.pushed.pop()
+		if self._tracks_transform():
+			self.matrices.pop()
+		n = self.names.pop()
+		if self.pinned and self.pinned[-1] == len(self.names):
+			self.pinned.pop()
+		if self.pending is not None:
+			self.end_pending()
+			self.spaces.exit()
+			return
+		self.flush_group()
+		self.in_sheet = False
+		depth = len(self.names)
+		if self.unwrapped and self.unwrapped[-1][0] == depth:
+			self.unwrapped.pop()
+		elif self.held and self.held[-1][0] == depth:
+			self.held.pop()
+			self.warn('Removing empty element: %s' % n)
+		else:
+			self.write_end(name, n)
+		if self.discard and self.discard[-1] == len(self.names):
+			self.pop_discard()
 		self.spaces.exit()
 
 	def _parse_file(self, f):
@@ -288,11 +703,135 @@ class SvgCleaner(object):
 			self.error('XML Parsing error: %s' %
 			           self.options.in_file)
 
+	def scan_refs(self, f):
+		index = refs.ReferenceIndex()
+		index.scan_file(f)
+		if not index.opaque:
+			self.refs = index.ids
+			self.unused_defs = index.unused
+
+	def build_tree(self, f):
+		f.seek(0, 2)
+		size = f.tell()
+		f.seek(0)
+		indexed = (self.options.groups and not self.options.transform) \
+			or self.options.elements or self.options.cull
+		try:
+			doc = tree.build(f, size, indexed, self.options.expat)
+		except tree.TreeSizeError:
+			self.warn('Document tree too large: %s' %
+				self.options.in_file)
+			return None
+		except ExpatError:
+			return None
+		ids = tree.references(doc)
+		if self.options.attrib and ids is not None:
+			tree.remove_unused_defs(doc, ids)
+			tree.remove_unused_ids(doc, ids)
+			self.refs = ids
+		if self.options.elements:
+			tree.remove_empty_groups(doc, ids)
+		return doc
+
+	def replay(self, doc):
+		'Clean a document tree by replaying its parser events'
+		if self.options.expat:
+			# Names in the tree are already qualified
+			self.spaces = namespace.DeclaredNamespaces()
+		if doc.xml is not None:
+			self.xml_decl(*doc.xml)
+		if doc.doctype is not None:
+			self.start_doctype_decl(*doc.doctype)
+		stack = [(None, iter(doc.children))]
+		while stack:
+			node, items = stack[-1]
+			item = next(items, None)
+			if item is None:
+				stack.pop()
+				if node is not None:
+					self.end_element(node.name)
+			elif isinstance(item, tree.Node):
+				self.index = item.index
+				self.start_element(item.name, item.attr_dict())
+				stack.append((item, iter(item.children or ())))
+			elif isinstance(item, tree.Comment):
+				self.comment(item.data)
+			elif isinstance(item, tree.CData):
+				self.start_cdata_section()
+				for c in item.chunks:
+					self.character_data(c)
+				self.end_cdata_section()
+			else:
+				self.character_data(item)
+
+	def scan_styles(self, f):
+		counter = css.StyleCounter(self.intern_style)
+		counter.scan_file(f)
+		if counter.stylesheet:
+			return
+		sheet = getattr(self.options, 'stylesheet', None)
+		shared = sheet is not None
+		if not shared:
+			sheet = css.StyleSheet()
+		if sheet.add_document(counter, shared):
+			self.css = sheet
+
+	def scan_rules(self, f):
+		try:
+			self.rules = css.scan_stylesheets(f)
+		except css.UnsupportedStyleSheetError as e:
+			self.warn('Unsupported stylesheet (%s): Style '
+			          'compression and group flattening disabled' % e)
+			self.options.style = False
+			self.options.groups = False
+
 	def clean_file(self):
 		self.warn('Processing file: %s' % self.options.in_file)
 		f = open(self.options.in_file, 'br')
 		try:
-			self._parse_file(f)
+			doc = None
+			if self.options.tree:
+				doc = self.build_tree(f)
+				f.seek(0)
+			if self.options.attrib and doc is None:
+				self.scan_refs(f)
+				f.seek(0)
+			if self.options.use:
+				self.reuse = reuse.PathIndex(self.options.digits)
+				self.reuse.scan_file(f)
+				f.seek(0)
+			if self.options.palette:
+				self.palette = palette.Palette(
+					self.options.palette)
+				self.palette.scan_file(f)
+				f.seek(0)
+			if self.options.style or self.options.groups:
+				self.scan_rules(f)
+				f.seek(0)
+			if self.options.xcss:
+				self.scan_styles(f)
+				f.seek(0)
+			if self.options.cull:
+				self.animations = refs.AnimationIndex()
+				self.animations.scan_file(f)
+				f.seek(0)
+			if self.options.elements:
+				self.children = collapse.ChildIndex()
+				self.children.scan_file(f)
+				f.seek(0)
+			if self.options.groups and not self.options.transform:
+				self.groups = flatten.GroupIndex(self.reuse,
+					self.rules)
+				self.groups.scan_file(f)
+				f.seek(0)
+			self.pipeline = passes.build(self)
+			if doc is not None:
+				self.replay(doc)
+			else:
+				self._parse_file(f)
+			if self.pipeline.timed:
+				for line in self.pipeline.report():
+					self.warn(line)
 		finally:
 			self.format.close()
 			f.close()
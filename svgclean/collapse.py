@@ -0,0 +1,141 @@
+#
+#   svgclean/collapse.py
+#
+#   This is a module to remove empty elements and unwrap groups.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from xml.parsers.expat import ParserCreate, ExpatError
+from . import props
+
+# Elements which have no effect without content (unless referenced)
+CONTAINERS = ('g', 'defs', 'symbol', 'switch', 'a', 'text', 'tspan',
+	'clipPath', 'mask', 'pattern', 'marker', 'linearGradient',
+	'radialGradient')
+
+# Elements which can take the style and transform of an unwrapped group
+_GRAPHICS = ('g', 'a', 'path', 'rect', 'circle', 'ellipse', 'line',
+	'polyline', 'polygon', 'text', 'use', 'image')
+
+# Elements which choose between their children
+_CHOOSERS = ('switch',)
+
+# Elements which could select groups by document structure
+_SELECTORS = ('style', 'script')
+
+def declared(attrs):
+	'Get the names of style properties declared by attributes'
+	names = set(p for p in props.NAMES if p in attrs)
+	for s in attrs.get('style', '').split(';'):
+		name = s.partition(':')[0].strip()
+		if name:
+			names.add(name)
+	return names
+
+def inherit(attrs, decls, xform):
+	'''Add the style properties and transform of an unwrapped group to the
+	attributes of its child.  The child must not declare any of the
+	properties, since its values could be relative to the group's.'''
+	for p, v in decls:
+		attrs[p] = v
+	if xform is not None:
+		if 'transform' in attrs:
+			attrs['transform'] = xform + ' ' + attrs['transform']
+		else:
+			attrs['transform'] = xform
+
+def is_inherited(decls):
+	'Check if all style properties are inherited by children'
+	for p, v in decls:
+		if not props.REGISTRY[p].inherited:
+			return False
+	return True
+
+class _Frame(object):
+	__slots__ = ('name', 'index', 'children', 'child', 'text',
+		'declared', 'overridden')
+
+	def __init__(self, name, index, declared):
+		self.name = name
+		self.index = index
+		self.children = 0
+		self.child = None
+		self.text = False
+		self.declared = declared
+		self.overridden = False
+
+class ChildIndex(object):
+	'''Index of groups with exactly one child element, which could be
+	unwrapped.  Groups are identified by their byte index in the
+	document.  Groups are not indexed if their child declares any of
+	the same style properties (which could be relative, like 50% or
+	bolder).  No groups are indexed in documents with stylesheets or
+	scripts, since they could select groups by structure.'''
+
+	def __init__(self):
+		self.single = set()
+		self.frames = []
+		self.selected = False
+
+	def start_element(self, name, attrs):
+		if name.split(':')[-1] in _SELECTORS:
+			self.selected = True
+		if self.frames:
+			f = self.frames[-1]
+			f.children += 1
+			f.child = name
+			if f.declared and f.declared & declared(attrs):
+				f.overridden = True
+		names = None
+		if name == 'g':
+			# Including properties from unwrapped parent groups
+			names = declared(attrs)
+			if self.frames and self.frames[-1].declared:
+				names |= self.frames[-1].declared
+		self.frames.append(_Frame(name, self.parser.CurrentByteIndex,
+			names))
+
+	def end_element(self, name):
+		f = self.frames.pop()
+		if f.name == 'g' and f.children == 1 and not f.text and \
+		   not f.overridden and \
+		   f.child in _GRAPHICS and self.frames and \
+		   self.frames[-1].name not in _CHOOSERS:
+			self.single.add(f.index)
+
+	def character_data(self, data):
+		if self.frames and data.strip():
+			self.frames[-1].text = True
+
+	def processing_instruction(self, target, data):
+		if target == 'xml-stylesheet':
+			self.selected = True
+
+	def scan_file(self, f):
+		self.parser = ParserCreate()
+		self.parser.StartElementHandler = self.start_element
+		self.parser.EndElementHandler = self.end_element
+		self.parser.CharacterDataHandler = self.character_data
+		self.parser.ProcessingInstructionHandler = \
+			self.processing_instruction
+		try:
+			self.parser.ParseFile(f)
+		except ExpatError:
+			pass
+		self.parser = None
+		self.frames = []
+		if self.selected:
+			self.single.clear()
+
+	def is_single(self, index):
+		'Check if a group has a single child, by byte index'
+		return index in self.single
@@ -16,15 +16,11 @@
 #
 
 import re
+from math import pi
+from . import format
 
-STYLES = (
-	'color',
-	'fill',
-	'stroke',
-	'flood-color',
-	'lighting-color',
-	'stop-color',
-)
+# Write colors with alpha as #rrggbbaa (CSS Color 4), instead of rgba()
+HEX_ALPHA = False
 
 _KEYWORDS = {
 	'aliceblue': 0xf0f8ff,
@@ -176,93 +172,190 @@ _KEYWORDS = {
 	'yellowgreen': 0x9acd32,
 }
 
-_TRIPLET = re.compile('^#([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])$')
-_SEXTUPLET = re.compile('^#([0-9a-fA-F]{6})$')
-_FUNCTION = re.compile(
-	r'^rgb\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*\)$')
-_PERCENT = re.compile(
-	r'^rgb\(\s*(\d{1,3})%\s*,\s*(\d{1,3})%\s*,\s*(\d{1,3})%\s*\)$')
+# Shortest keyword for each keyword color value
+_NAMES = {}
+for _key in sorted(_KEYWORDS, key=lambda k: (len(k), k)):
+	_NAMES.setdefault(_KEYWORDS[_key], _key)
+
+# Keywords which are valid, but cannot be normalized
+_SPECIAL = ('none', 'currentcolor')
+
+_HEX = re.compile('^#([0-9a-f]{3,4}|[0-9a-f]{6}|[0-9a-f]{8})$')
+_FUNCTION = re.compile(r'^(rgba?|hsla?)\(([^()]*)\)$')
+_COMPONENT = re.compile(
+	r'^([+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?)(%|deg|rad|grad|turn)?$')
 _URL = re.compile(r'^url\(#.*\)$')
 
-def validate(value):
-	'Validate a color style value'
-	v = value.lower()
-	if v == 'none':
-		return
-	if v in _KEYWORDS:
-		return
-	if _TRIPLET.match(v):
-		return
-	if _SEXTUPLET.match(v):
-		return
-	if _FUNCTION.match(v):
-		return
-	if _PERCENT.match(v):
-		return
-	if _URL.match(v):
-		return
-	raise ValueError(value)
+# Hue units, in degrees
+_HUE_UNITS = {
+	None: 1.0,
+	'deg': 1.0,
+	'rad': 180.0 / pi,
+	'grad': 0.9,
+	'turn': 360.0,
+}
+
+def _split_args(text):
+	if ',' in text:
+		return [a.strip() for a in text.split(',')]
+	parts = text.split('/')
+	if len(parts) > 2:
+		return None
+	args = parts[0].split()
+	if len(parts) == 2:
+		args.append(parts[1].strip())
+	return args
+
+def _components(text):
+	args = _split_args(text)
+	if args is None or len(args) not in (3, 4):
+		return None
+	comps = []
+	for a in args:
+		m = _COMPONENT.match(a)
+		if not m:
+			return None
+		comps.append((float(m.group(1)), m.group(2)))
+	return comps
+
+def _clamp(v, lo, hi):
+	return max(lo, min(v, hi))
+
+def _channel(v, unit):
+	if unit == '%':
+		v = 255 * v / 100
+	elif unit is not None:
+		raise ValueError(unit)
+	return int(round(_clamp(v, 0, 255)))
+
+def _alpha(comps):
+	if len(comps) < 4:
+		return 1.0
+	v, unit = comps[3]
+	if unit == '%':
+		v /= 100
+	elif unit is not None:
+		raise ValueError(unit)
+	return _clamp(v, 0.0, 1.0)
 
-def _triplet(r, g, b):
-	return (int(r * 2, 16) << 16) + (int(g * 2, 16) << 8) + int(b * 2, 16)
+def _fraction(v, unit):
+	if unit not in ('%', None):
+		raise ValueError(unit)
+	return _clamp(v / 100, 0.0, 1.0)
 
-def _rgb(r, g, b):
-	r = max(0, min(int(r), 255))
-	g = max(0, min(int(g), 255))
-	b = max(0, min(int(b), 255))
+def _hue_channel(p, q, t):
+	t %= 1.0
+	if t < 1 / 6.0:
+		return p + (q - p) * 6 * t
+	if t < 0.5:
+		return q
+	if t < 2 / 3.0:
+		return p + (q - p) * (2 / 3.0 - t) * 6
+	return p
+
+def _hsl(h, s, l):
+	if l <= 0.5:
+		q = l * (1 + s)
+	else:
+		q = l + s - l * s
+	p = 2 * l - q
+	h /= 360.0
+	r = _hue_channel(p, q, h + 1 / 3.0)
+	g = _hue_channel(p, q, h)
+	b = _hue_channel(p, q, h - 1 / 3.0)
+	return _pack(*(int(round(255 * c)) for c in (r, g, b)))
+
+def _pack(r, g, b):
 	return (r << 16) + (g << 8) + b
 
-def _percent(r, g, b):
-	r = round(255 * float(r) / 100)
-	g = round(255 * float(g) / 100)
-	b = round(255 * float(b) / 100)
-	return _rgb(r, g, b)
+def _parse_hex(h):
+	if len(h) in (3, 4):
+		h = ''.join(c * 2 for c in h)
+	if len(h) == 8:
+		return int(h[:6], 16), int(h[6:], 16) / 255.0
+	return int(h, 16), 1.0
 
-def normalize_to_int(value):
-	v = value.lower()
-	if v in _KEYWORDS:
-		return _KEYWORDS[v]
-	m = _TRIPLET.match(v)
-	if m:
-		return _triplet(m.group(1), m.group(2), m.group(3))
-	m = _SEXTUPLET.match(v)
+def _parse_function(name, text):
+	comps = _components(text)
+	if comps is None:
+		return None
+	try:
+		alpha = _alpha(comps)
+		if name.startswith('rgb'):
+			return _pack(*(_channel(v, u) for v, u in comps[:3])), alpha
+		v, unit = comps[0]
+		if unit not in _HUE_UNITS:
+			return None
+		h = v * _HUE_UNITS[unit]
+		s = _fraction(*comps[1])
+		l = _fraction(*comps[2])
+		return _hsl(h, s, l), alpha
+	except ValueError:
+		return None
+
+def parse(value):
+	'''Parse a color value as (rgb, alpha), or None if it is not a plain
+	color'''
+	v = value.strip().lower()
+	rgb = _KEYWORDS.get(v)
+	if rgb is not None:
+		return rgb, 1.0
+	if v == 'transparent':
+		return 0, 0.0
+	m = _HEX.match(v)
 	if m:
-		return int(m.group(1), 16)
+		return _parse_hex(m.group(1))
 	m = _FUNCTION.match(v)
 	if m:
-		return _rgb(m.group(1), m.group(2), m.group(3))
-	m = _PERCENT.match(v)
-	if m:
-		return _percent(m.group(1), m.group(2), m.group(3))
+		return _parse_function(m.group(1), m.group(2))
+
+def validate(value):
+	'Validate a color style value'
+	v = value.lower()
+	if v in _SPECIAL or _URL.match(v) or parse(v) is not None:
+		return
+	raise ValueError(value)
 
-def _check_pair(h):
-	if h[0] == h[1]:
-		return h[0]
+def normalize_to_int(value):
+	'Get the rgb value of an opaque color, or None'
+	c = parse(value)
+	if c is not None and c[1] >= 1:
+		return c[0]
 
-def _check_triplet(value):
-	rgb = '%06x' % value
-	rr = rgb[0:2]
-	gg = rgb[2:4]
-	bb = rgb[4:6]
-	r = _check_pair(rr)
-	g = _check_pair(gg)
-	b = _check_pair(bb)
-	if r and g and b:
-		return '%s%s%s' % (r, g, b)
-	else:
-		return rgb
+def _hex(digits):
+	if all(digits[i] == digits[i + 1] for i in range(0, len(digits), 2)):
+		return '#' + digits[::2]
+	return '#' + digits
+
+def shortest(rgb, alpha=1.0):
+	'Get the shortest representation of a color'
+	a = int(round(alpha * 255))
+	if a < 255:
+		if HEX_ALPHA:
+			return _hex('%06x%02x' % (rgb, a))
+		return 'rgba(%d,%d,%d,%s)' % (rgb >> 16, (rgb >> 8) & 0xff,
+			rgb & 0xff, format.from_number(alpha, 3))
+	h = _hex('%06x' % rgb)
+	name = _NAMES.get(rgb)
+	if name is not None and len(name) < len(h):
+		return name
+	return h
 
 def normalize(value):
 	'Normalize a color style value'
-	v = normalize_to_int(value)
-	if v is None:
+	c = parse(value)
+	if c is None:
 		return value
-	elif v in list(_KEYWORDS.values()):
-		for key in _KEYWORDS:
-			if _KEYWORDS[key] == v:
-				return key
-	h = _check_triplet(v)
-	return '#' + h
+	return shortest(*c)
+
+def normalize_all(values):
+	'''Normalize a sequence of color values, parsing each distinct value
+	only once.  Returns a map of value to normalized value.'''
+	normal = {}
+	for v in values:
+		if v not in normal:
+			normal[v] = normalize(v)
+	return normal
 
 def _normalize(value):
 	v = normalize(value)
@@ -285,3 +378,11 @@ if __name__ == '__main__':
 	_normalize('#ffb6c2')
 	_normalize('#667788')
 	_normalize('#123')
+	_normalize('#ff0000')
+	_normalize('#d2b48c')
+	_normalize('rgba(255,0,0,0.5)')
+	_normalize('rgb(255 0 0 / 100%)')
+	_normalize('hsl(120, 100%, 25%)')
+	_normalize('hsla(0.5turn, 100%, 50%, 1)')
+	_normalize('#11223344')
+	_normalize('transparent')
@@ -0,0 +1,347 @@
+#
+#   svgclean/css.py
+#
+#   This is a module to move repeated inline styles into a stylesheet.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from xml.parsers.expat import ParserCreate, ExpatError
+import re
+from . import props
+from . import style
+
+class UnsupportedStyleSheetError(Exception):
+	pass
+
+# Approximate length of an embedded style element, without rules
+_STYLE_COST = len("<style type='text/css'></style>")
+
+_LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+def _class_name(n):
+	name = ''
+	while True:
+		name = _LETTERS[n % 26] + name
+		n = n // 26 - 1
+		if n < 0:
+			return name
+
+def _rule(name, value):
+	return '.%s{%s}' % (name, value)
+
+def text_token(text):
+	'Get a token for stylesheet text, quoted if needed'
+	if '<' in text or '&' in text:
+		return '<![CDATA[%s]]>' % text
+	return text
+
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_SPACE = re.compile(r'\s+')
+_SELECTOR = re.compile(r'^(\*|[A-Za-z][\w-]*)?((?:[.#][\w-]+)*)$')
+_PART = re.compile(r'([.#])([\w-]+)')
+
+# At-rules which do not contain style rules
+_AT_STATEMENTS = ('@charset', '@namespace')
+_AT_BLOCKS = ('@font-face',)
+
+class Selector(object):
+	'Simple selector of type, class and id'
+
+	def __init__(self, text):
+		m = _SELECTOR.match(text)
+		if not (text and m):
+			raise UnsupportedStyleSheetError(text)
+		self.text = text
+		self.element = m.group(1) or '*'
+		self.classes = []
+		self.ids = []
+		for kind, name in _PART.findall(m.group(2)):
+			if kind == '.':
+				self.classes.append(name)
+			else:
+				self.ids.append(name)
+		self.specificity = (len(self.ids), len(self.classes),
+			0 if self.element == '*' else 1)
+
+	def key(self):
+		'Get the most specific index key'
+		if self.ids:
+			return '#' + self.ids[0]
+		elif self.classes:
+			return '.' + self.classes[0]
+		else:
+			return self.element
+
+	def matches(self, name, classes, ident):
+		if self.element != '*' and self.element != name:
+			return False
+		for c in self.classes:
+			if c not in classes:
+				return False
+		for i in self.ids:
+			if i != ident:
+				return False
+		return True
+
+def _parse_declarations(text):
+	decls = []
+	for d in text.split(';'):
+		name, sep, value = d.partition(':')
+		name = name.strip().lower()
+		value = value.strip()
+		if not (name and sep):
+			continue
+		if '!important' in value.replace(' ', ''):
+			raise UnsupportedStyleSheetError(d)
+		decls.append((name, value))
+	return decls
+
+def _minify_value(name, value):
+	try:
+		return style.normalize_prop(name, value)
+	except (ValueError, AttributeError):
+		return value
+
+class StyleRules(object):
+	'''Style rules of all stylesheets in a document.  Only simple
+	selectors (type, class and id) are supported.'''
+
+	def __init__(self):
+		self.rules = []
+		self.index = {}
+		self.ids = set()
+		self.sheets = []
+
+	def _add_rule(self, selectors, decls):
+		n = len(self.rules)
+		for sel in selectors:
+			self.index.setdefault(sel.key(), []).append((sel, n))
+			self.ids.update(sel.ids)
+		rule = (selectors, decls)
+		self.rules.append(rule)
+		return rule
+
+	def parse(self, text):
+		'Parse the text of one stylesheet'
+		text = _COMMENT.sub('', text)
+		items = []
+		while True:
+			text = text.lstrip()
+			if not text:
+				break
+			if text.startswith('@'):
+				word = text.split(None, 1)[0].split('{')[0].lower()
+				if word in _AT_STATEMENTS:
+					i = text.find(';') + 1
+					if i <= 0:
+						raise UnsupportedStyleSheetError(text)
+					items.append(_SPACE.sub(' ', text[:i]))
+					text = text[i:]
+					continue
+				if word not in _AT_BLOCKS:
+					raise UnsupportedStyleSheetError(word)
+			b = text.find('{')
+			e = text.find('}', b)
+			if b < 0 or e < 0 or '{' in text[b + 1:e]:
+				raise UnsupportedStyleSheetError(text)
+			head = text[:b].strip()
+			decls = _parse_declarations(text[b + 1:e])
+			text = text[e + 1:]
+			if head.startswith('@'):
+				items.append((head, decls))
+				continue
+			selectors = [Selector(t.strip())
+				for t in head.split(',')]
+			items.append(self._add_rule(selectors, decls))
+		self.sheets.append(items)
+
+	def match(self, name, attrs):
+		'''Get the declarations of all rules matching an element, in
+		cascade order, as a tuple of (property, value)'''
+		name = name.split(':')[-1]
+		classes = attrs.get('class', '').split()
+		ident = attrs.get('id')
+		keys = [name, '*']
+		keys.extend('.' + c for c in classes)
+		if ident is not None:
+			keys.append('#' + ident)
+		found = set()
+		for k in keys:
+			for sel, n in self.index.get(k, ()):
+				if sel.matches(name, classes, ident):
+					found.add((sel.specificity, n))
+		decls = {}
+		for spec, n in sorted(found):
+			for p, v in self.rules[n][1]:
+				if p in props.REGISTRY:
+					decls.pop(p, None)
+					decls[p] = v
+		return tuple(decls.items())
+
+	def _minify_item(self, item):
+		if isinstance(item, str):
+			return item
+		head, decls = item
+		if not isinstance(head, str):
+			head = ','.join(sel.text for sel in head)
+		body = ';'.join('%s:%s' % (p, _minify_value(p, v))
+			for p, v in decls)
+		return '%s{%s}' % (head, body)
+
+	def minify(self, n):
+		'Get the minified text of one stylesheet'
+		return ''.join(self._minify_item(item)
+			for item in self.sheets[n])
+
+class _SheetScanner(object):
+
+	def __init__(self):
+		self.rules = StyleRules()
+		self.depth = 0
+		self.text = []
+
+	def start_element(self, name, attrs):
+		if self.depth:
+			self.depth += 1
+		elif name.split(':')[-1] == 'style':
+			self.depth = 1
+			self.text = []
+
+	def end_element(self, name):
+		if self.depth:
+			self.depth -= 1
+			if not self.depth:
+				self.rules.parse(''.join(self.text))
+
+	def character_data(self, data):
+		if self.depth:
+			self.text.append(data)
+
+def scan_stylesheets(f):
+	'''Scan the stylesheets of a document.  Returns StyleRules, or None
+	if there are no stylesheets.'''
+	scanner = _SheetScanner()
+	parser = ParserCreate()
+	parser.StartElementHandler = scanner.start_element
+	parser.EndElementHandler = scanner.end_element
+	parser.CharacterDataHandler = scanner.character_data
+	try:
+		parser.ParseFile(f)
+	except ExpatError:
+		pass
+	if scanner.rules.sheets:
+		return scanner.rules
+
+class StyleCounter(object):
+	'''Counter of inline styles in a document.  The intern function maps
+	(parent style, raw style input, stroke width) to (style, attributes)
+	the same way as the cleaner.'''
+
+	def __init__(self, intern):
+		self.intern = intern
+		self.styles = [style.ROOT]
+		self.counts = {}
+		self.classes = set()
+		self.stylesheet = False
+
+	def start_element(self, name, attrs):
+		if name.split(':')[-1] == 'style':
+			self.stylesheet = True
+		cls = attrs.get('class')
+		if cls is not None:
+			self.classes.update(cls.split())
+		raw = style.split_input(attrs)
+		s, out = self.intern(self.styles[-1], raw, None)
+		self.styles.append(s)
+		if cls is None:
+			for a, v in out:
+				if a == 'style':
+					self.counts[v] = self.counts.get(v, 0) + 1
+
+	def end_element(self, name):
+		self.styles.pop()
+
+	def scan_file(self, f):
+		parser = ParserCreate()
+		parser.StartElementHandler = self.start_element
+		parser.EndElementHandler = self.end_element
+		try:
+			parser.ParseFile(f)
+		except ExpatError:
+			pass
+
+class StyleSheet(object):
+	'''Stylesheet of generated classes for repeated inline styles.  One
+	stylesheet can be shared by a batch of documents.'''
+
+	def __init__(self):
+		self.classes = {}
+		self.rules = []
+		self.reserved = set()
+		self.n = 0
+
+	def _next_name(self):
+		while True:
+			name = _class_name(self.n)
+			self.n += 1
+			if name not in self.reserved:
+				return name
+
+	def _saved(self, value, count):
+		name = self.classes.get(value)
+		if name is None:
+			name = _class_name(self.n)
+			cost = len(_rule(name, value))
+		else:
+			cost = 0
+		inline = len(" style=''") + len(value)
+		cls = len(" class=''") + len(name)
+		return count * (inline - cls) - cost
+
+	def add_document(self, counter, shared):
+		'''Add classes for the styles of one document.  Returns True if
+		the document can use the stylesheet.'''
+		used = set(self.classes.values())
+		if used & counter.classes:
+			return False
+		self.reserved.update(counter.classes)
+		counts = sorted(counter.counts.items(),
+			key=lambda vc: (-vc[1], vc[0]))
+		saved = [(v, c) for v, c in counts if self._saved(v, c) > 0]
+		total = sum(self._saved(v, c) for v, c in saved)
+		if not shared and total <= _STYLE_COST:
+			return False
+		for value, count in saved:
+			if value not in self.classes and \
+			   self._saved(value, count) > 0:
+				name = self._next_name()
+				self.classes[value] = name
+				self.rules.append((name, value))
+		for value in counter.counts:
+			if value in self.classes:
+				return True
+		return False
+
+	def lookup(self, value):
+		'Get the class name for an inline style value, or None'
+		return self.classes.get(value)
+
+	def text(self):
+		return ''.join(_rule(name, value) for name, value in self.rules)
+
+	def write_file(self, fname):
+		f = open(fname, 'w')
+		try:
+			f.write(self.text())
+			f.write('\n')
+		finally:
+			f.close()
@@ -0,0 +1,305 @@
+#
+#   svgclean/curve.py
+#
+#   This is a module to approximate bezier curves.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from math import sqrt, hypot, sin, cos, tan, atan2, radians, degrees, pi, \
+	ceil
+
+# Maximum number of cubic segments to fit with one cubic.  This keeps
+# fitting linear in the number of segments.
+_MAX_RUN = 8
+
+# Curve parameters to sample on each cubic segment
+_SAMPLES = (0.25, 0.5, 0.75, 1.0)
+
+# Minimum cosine of the angle between tangents at a joint to fit a run
+_SMOOTH = 0.9
+
+_EPSILON = 1.0e-12
+
+def _distance(p0, p1):
+	return hypot(p1[0] - p0[0], p1[1] - p0[1])
+
+def segment_distance(p, a, b):
+	'Get the distance from a point to a line segment'
+	dx = b[0] - a[0]
+	dy = b[1] - a[1]
+	d2 = dx * dx + dy * dy
+	if d2 < _EPSILON:
+		return _distance(p, a)
+	t = ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / d2
+	t = max(0.0, min(t, 1.0))
+	return _distance(p, (a[0] + t * dx, a[1] + t * dy))
+
+def _unit(p0, p1):
+	d = _distance(p0, p1)
+	if d < _EPSILON:
+		return None
+	return ((p1[0] - p0[0]) / d, (p1[1] - p0[1]) / d)
+
+def cubic_point(c, t):
+	'Get a point on a cubic curve'
+	p0, p1, p2, p3 = c
+	s = 1.0 - t
+	b0 = s * s * s
+	b1 = 3.0 * s * s * t
+	b2 = 3.0 * s * t * t
+	b3 = t * t * t
+	return (b0 * p0[0] + b1 * p1[0] + b2 * p2[0] + b3 * p3[0],
+	        b0 * p0[1] + b1 * p1[1] + b2 * p2[1] + b3 * p3[1])
+
+def is_flat_quadratic(p0, p1, p2, tolerance):
+	'Check if a quadratic curve is a line within a tolerance'
+	return segment_distance(p1, p0, p2) <= tolerance
+
+def is_flat_cubic(c, tolerance):
+	'Check if a cubic curve is a line within a tolerance'
+	p0, p1, p2, p3 = c
+	return segment_distance(p1, p0, p3) <= tolerance and \
+	       segment_distance(p2, p0, p3) <= tolerance
+
+def reduce_cubic(c, tolerance):
+	'Reduce a cubic curve to a quadratic control point, if possible'
+	p0, p1, p2, p3 = c
+	dx = p3[0] - 3.0 * p2[0] + 3.0 * p1[0] - p0[0]
+	dy = p3[1] - 3.0 * p2[1] + 3.0 * p1[1] - p0[1]
+	if sqrt(3.0) / 36.0 * hypot(dx, dy) <= tolerance:
+		return ((3.0 * (p1[0] + p2[0]) - p0[0] - p3[0]) / 4.0,
+		        (3.0 * (p1[1] + p2[1]) - p0[1] - p3[1]) / 4.0)
+
+def _start_tangent(c):
+	p0, p1, p2, p3 = c
+	return _unit(p0, p1) or _unit(p0, p2) or _unit(p0, p3)
+
+def _end_tangent(c):
+	p0, p1, p2, p3 = c
+	return _unit(p3, p2) or _unit(p3, p1) or _unit(p3, p0)
+
+def _sample(cubics):
+	pts = [cubics[0][0]]
+	for c in cubics:
+		for t in _SAMPLES:
+			pts.append(cubic_point(c, t))
+	return pts
+
+def _chord_params(pts):
+	u = [0.0]
+	for i in range(1, len(pts)):
+		u.append(u[-1] + _distance(pts[i - 1], pts[i]))
+	total = u[-1]
+	if total < _EPSILON:
+		return None
+	return [v / total for v in u]
+
+def _generate(pts, u, t0, t1):
+	'Fit a cubic to points with fixed end tangents (least squares)'
+	p0 = pts[0]
+	p3 = pts[-1]
+	c00 = c01 = c11 = x0 = x1 = 0.0
+	for p, t in zip(pts, u):
+		s = 1.0 - t
+		b0 = s * s * s
+		b1 = 3.0 * s * s * t
+		b2 = 3.0 * s * t * t
+		b3 = t * t * t
+		a1 = (t0[0] * b1, t0[1] * b1)
+		a2 = (t1[0] * b2, t1[1] * b2)
+		c00 += a1[0] * a1[0] + a1[1] * a1[1]
+		c01 += a1[0] * a2[0] + a1[1] * a2[1]
+		c11 += a2[0] * a2[0] + a2[1] * a2[1]
+		rx = p[0] - (p0[0] * (b0 + b1) + p3[0] * (b2 + b3))
+		ry = p[1] - (p0[1] * (b0 + b1) + p3[1] * (b2 + b3))
+		x0 += a1[0] * rx + a1[1] * ry
+		x1 += a2[0] * rx + a2[1] * ry
+	det = c00 * c11 - c01 * c01
+	seg = _distance(p0, p3) / 3.0
+	if abs(det) < _EPSILON:
+		alpha0 = alpha1 = seg
+	else:
+		alpha0 = (x0 * c11 - x1 * c01) / det
+		alpha1 = (c00 * x1 - c01 * x0) / det
+		if alpha0 < _EPSILON or alpha1 < _EPSILON:
+			alpha0 = alpha1 = seg
+	return (p0, (p0[0] + t0[0] * alpha0, p0[1] + t0[1] * alpha0),
+	        (p3[0] + t1[0] * alpha1, p3[1] + t1[1] * alpha1), p3)
+
+def _max_error(c, pts, u):
+	err = 0.0
+	for p, t in zip(pts, u):
+		err = max(err, _distance(p, cubic_point(c, t)))
+	return err
+
+def _newton(c, p, t):
+	'Improve a curve parameter for a point with one Newton step'
+	p0, p1, p2, p3 = c
+	s = 1.0 - t
+	q = cubic_point(c, t)
+	d1 = [3.0 * (s * s * (p1[i] - p0[i]) + 2.0 * s * t * (p2[i] - p1[i])
+	      + t * t * (p3[i] - p2[i])) for i in (0, 1)]
+	d2 = [6.0 * (s * (p2[i] - 2.0 * p1[i] + p0[i])
+	      + t * (p3[i] - 2.0 * p2[i] + p1[i])) for i in (0, 1)]
+	dx = q[0] - p[0]
+	dy = q[1] - p[1]
+	num = dx * d1[0] + dy * d1[1]
+	den = d1[0] * d1[0] + d1[1] * d1[1] + dx * d2[0] + dy * d2[1]
+	if abs(den) < _EPSILON:
+		return t
+	return max(0.0, min(t - num / den, 1.0))
+
+def fit_run(cubics, tolerance):
+	'Fit a run of cubic curves with one cubic, if possible'
+	t0 = _start_tangent(cubics[0])
+	t1 = _end_tangent(cubics[-1])
+	if t0 is None or t1 is None:
+		return None
+	pts = _sample(cubics)
+	u = _chord_params(pts)
+	if u is None:
+		return None
+	c = _generate(pts, u, t0, t1)
+	if _max_error(c, pts, u) <= tolerance:
+		return c
+	u = [_newton(c, p, t) for p, t in zip(pts, u)]
+	c = _generate(pts, u, t0, t1)
+	if _max_error(c, pts, u) <= tolerance:
+		return c
+
+def _is_smooth(c0, c1):
+	t0 = _end_tangent(c0)
+	t1 = _start_tangent(c1)
+	if t0 is None or t1 is None:
+		return False
+	return -(t0[0] * t1[0] + t0[1] * t1[1]) >= _SMOOTH
+
+def fit_cubics(cubics, tolerance):
+	'Fit a list of connected cubic curves with fewer cubics'
+	result = []
+	run = [cubics[0]]
+	fit = cubics[0]
+	for c in cubics[1:]:
+		f = None
+		if len(run) < _MAX_RUN and _is_smooth(run[-1], c):
+			f = fit_run(run + [c], tolerance)
+		if f:
+			run.append(c)
+			fit = f
+		else:
+			result.append(fit)
+			run = [c]
+			fit = c
+	result.append(fit)
+	return result
+
+def _angle(ux, uy, vx, vy):
+	return atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+def arc_center(p0, values):
+	"""Convert an arc from endpoint to center parameterization.
+	Returns (cx, cy, rx, ry, phi, theta1, dtheta), or None if the arc
+	is a straight line."""
+	rx, ry, rot, large, sweep, x, y = values
+	x1, y1 = p0
+	rx = abs(rx)
+	ry = abs(ry)
+	if rx == 0 or ry == 0:
+		return None
+	phi = radians(rot)
+	cp = cos(phi)
+	sp = sin(phi)
+	dx = (x1 - x) / 2.0
+	dy = (y1 - y) / 2.0
+	x1p = cp * dx + sp * dy
+	y1p = -sp * dx + cp * dy
+	lam = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry)
+	if lam > 1:
+		rx *= sqrt(lam)
+		ry *= sqrt(lam)
+	num = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+	den = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+	if den == 0:
+		return None
+	sq = sqrt(max(0.0, num / den))
+	if bool(large) == bool(sweep):
+		sq = -sq
+	cxp = sq * rx * y1p / ry
+	cyp = -sq * ry * x1p / rx
+	cx = cp * cxp - sp * cyp + (x1 + x) / 2.0
+	cy = sp * cxp + cp * cyp + (y1 + y) / 2.0
+	ux = (x1p - cxp) / rx
+	uy = (y1p - cyp) / ry
+	vx = (-x1p - cxp) / rx
+	vy = (-y1p - cyp) / ry
+	theta1 = _angle(1.0, 0.0, ux, uy)
+	dtheta = _angle(ux, uy, vx, vy)
+	if not sweep and dtheta > 0:
+		dtheta -= 2 * pi
+	elif sweep and dtheta < 0:
+		dtheta += 2 * pi
+	return (cx, cy, rx, ry, phi, theta1, dtheta)
+
+def ellipse_cubics(cx, cy, rx, ry, phi, theta1, dtheta):
+	'Approximate an elliptical arc with cubic curves'
+	n = max(1, int(ceil(abs(dtheta) / (pi / 2) - 1.0e-9)))
+	step = dtheta / n
+	alpha = 4.0 / 3.0 * tan(step / 4.0)
+	cp = cos(phi)
+	sp = sin(phi)
+	t = theta1
+	ct = cos(t)
+	st = sin(t)
+	for i in range(n):
+		t2 = t + step
+		ct2 = cos(t2)
+		st2 = sin(t2)
+		x1 = cx + rx * cp * ct - ry * sp * st
+		y1 = cy + rx * sp * ct + ry * cp * st
+		x2 = cx + rx * cp * ct2 - ry * sp * st2
+		y2 = cy + rx * sp * ct2 + ry * cp * st2
+		dx1 = -rx * cp * st - ry * sp * ct
+		dy1 = -rx * sp * st + ry * cp * ct
+		dx2 = -rx * cp * st2 - ry * sp * ct2
+		dy2 = -rx * sp * st2 + ry * cp * ct2
+		yield (x1 + alpha * dx1, y1 + alpha * dy1,
+		       x2 - alpha * dx2, y2 - alpha * dy2, x2, y2)
+		t = t2
+		ct = ct2
+		st = st2
+
+def transform_arc(values, m):
+	"""Transform the radii, rotation and sweep of an arc by a matrix.
+	The end point is not transformed."""
+	rx, ry, rot, large, sweep, x, y = values
+	a, b, c, d = m[:4]
+	phi = radians(rot)
+	cp = cos(phi)
+	sp = sin(phi)
+	# Columns of the transformed ellipse axes
+	ux = (a * cp + c * sp) * rx
+	uy = (b * cp + d * sp) * rx
+	vx = (-a * sp + c * cp) * ry
+	vy = (-b * sp + d * cp) * ry
+	# Principal axes of the transformed ellipse
+	p = ux * ux + vx * vx
+	q = ux * uy + vx * vy
+	r = uy * uy + vy * vy
+	theta = atan2(2.0 * q, p - r) / 2.0
+	ct = cos(theta)
+	st = sin(theta)
+	l1 = p * ct * ct + 2.0 * q * ct * st + r * st * st
+	l2 = p + r - l1
+	if a * d - b * c < 0:
+		sweep = 0 if sweep else 1
+	return [sqrt(max(l1, 0.0)), sqrt(max(l2, 0.0)), degrees(theta),
+		large, sweep, x, y]
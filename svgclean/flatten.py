@@ -0,0 +1,236 @@
+#
+#   svgclean/flatten.py
+#
+#   This is a module to push group transforms down into child elements.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from xml.parsers.expat import ParserCreate, ExpatError
+from math import sqrt
+from . import bbox
+from . import format
+from . import path
+from . import shape
+from . import style
+from . import transform
+
+# Requirements for a matrix which an element can absorb
+NEVER = 1		# element cannot absorb any matrix
+TRANSLATE = 2		# translation only
+SIMILAR = 4		# rotation, reflection and uniform scale
+AXIS = 8		# no rotation or skew
+
+# Elements which are not affected by the transform of their parent
+_UNAFFECTED = ('title', 'desc', 'metadata', 'defs', 'style', 'script',
+	'linearGradient', 'radialGradient', 'clipPath', 'mask', 'marker',
+	'pattern', 'symbol', 'filter')
+
+_SHAPES = {
+	'path': 0,
+	'polygon': 0,
+	'polyline': 0,
+	'line': 0,
+	'rect': AXIS,
+	'circle': AXIS | SIMILAR,
+	'ellipse': AXIS,
+}
+
+# Styles which depend on the user space of an element
+_USER_SPACE_STYLES = ('filter', 'clip-path', 'mask')
+
+_MARKER_STYLES = ('marker', 'marker-start', 'marker-mid', 'marker-end')
+
+_EPSILON = 1.0e-9
+
+def _is_none(value):
+	return value is None or value == 'none'
+
+def _local_name(name):
+	return name.split(':')[-1]
+
+def _can_transform(name, attrs):
+	try:
+		if name == 'path':
+			for c in path.split_commands(attrs['d']):
+				pass
+		else:
+			shape.transform(name, dict(attrs), transform.Matrix())
+	except (KeyError, ValueError, path.InvalidPathError):
+		return False
+	return True
+
+def requirements(name, attrs, style):
+	'Get the requirements for a matrix which an element can absorb'
+	name = _local_name(name)
+	if name in _UNAFFECTED:
+		return 0
+	if name not in _SHAPES:
+		return NEVER
+	for p in _USER_SPACE_STYLES:
+		if not _is_none(style.get_prop(p)):
+			return NEVER
+	for p in ('fill', 'stroke'):
+		v = style.get_prop(p)
+		if v is not None and v.startswith('url('):
+			return NEVER
+	if not _can_transform(name, attrs):
+		return NEVER
+	req = _SHAPES[name]
+	for p in _MARKER_STYLES:
+		if not _is_none(style.get_prop(p)):
+			req |= TRANSLATE
+	if not _is_none(style.get_prop('stroke')):
+		req |= SIMILAR
+		if _stroke_width(style) is None:
+			req |= TRANSLATE
+		if not _is_none(style.get_prop('stroke-dasharray')):
+			req |= TRANSLATE
+	return req
+
+def _stroke_width(style):
+	return bbox.parse_length(style.get_prop('stroke-width') or '1')
+
+def _is_translation(m):
+	return m[:4] == (1, 0, 0, 1)
+
+def satisfies(req, m):
+	'Check if a matrix satisfies requirements'
+	if req & NEVER:
+		return False
+	if req & TRANSLATE and not _is_translation(m):
+		return False
+	a, b, c, d = m[:4]
+	eps = _EPSILON * max(1.0, a * a + b * b + c * c + d * d)
+	if req & AXIS and (abs(b) > eps or abs(c) > eps):
+		return False
+	if req & SIMILAR:
+		if abs(a * a + b * b - c * c - d * d) > eps:
+			return False
+		if abs(a * c + b * d) > eps:
+			return False
+	return True
+
+def absorb(name, attrs, style, mtx):
+	"""Apply a matrix (including the element's own transform) to the
+	geometry of an element.  The matrix must satisfy the element's
+	requirements.  Returns the new stroke width, if it must change."""
+	name = _local_name(name)
+	if name in _UNAFFECTED:
+		return None
+	attrs.pop('transform', None)
+	shape.transform(name, attrs, mtx)
+	m = mtx.m
+	if not (_is_none(style.get_prop('stroke')) or _is_translation(m)):
+		scale = sqrt(abs(m[0] * m[3] - m[1] * m[2]))
+		width = _stroke_width(style) * scale
+		return format.from_number(width, None)
+	return None
+
+def _ignore(msg):
+	pass
+
+def _is_valid_transform(attrs):
+	try:
+		transform.parse_transform(attrs.get('transform', ''))
+	except transform.InvalidTransformError:
+		return False
+	return True
+
+class _Frame(object):
+
+	def __init__(self, index, req, target):
+		self.index = index
+		self.req = req
+		self.target = target
+
+class GroupIndex(object):
+	'''Index of groups with transforms, with requirements for pushing
+	their transforms down into child elements.  Elements are identified
+	by their byte index in the document.  Styles are computed as by the
+	cleaner, including matching style rules.'''
+
+	def __init__(self, reuse=None, rules=None):
+		self.reuse = reuse
+		self.rules = rules
+		self.groups = {}
+		self.frames = []
+		self.styles = [style.ROOT]
+
+	def _target(self):
+		if self.frames:
+			return self.frames[-1].target
+
+	def _style(self, name, attrs):
+		parent = self.styles[-1]
+		attrs = dict(attrs)
+		if self.rules:
+			decls = self.rules.match(name, attrs)
+			if decls:
+				# Style rules override presentation attributes
+				parent = style.Style(parent, dict(decls), True,
+					_ignore)
+				for p, v in decls:
+					attrs.pop(p, None)
+		return style.Style(parent, attrs, warn=_ignore)
+
+	def start_element(self, name, attrs):
+		s = self._style(name, attrs)
+		self.styles.append(s)
+		if self.reuse:
+			attrs = dict(attrs)
+			name = self.reuse.replace_path(name, attrs)
+		target = self._target()
+		# An invalid transform cannot absorb a pushed matrix
+		valid = _is_valid_transform(attrs)
+		if not valid and target is not None:
+			target.req |= NEVER
+		if _local_name(name) == 'g':
+			req = 0
+			for p in _USER_SPACE_STYLES:
+				if not _is_none(s.get_prop(p)):
+					req = NEVER
+			if not valid:
+				req = NEVER
+			if 'transform' in attrs:
+				f = _Frame(self.parser.CurrentByteIndex, req,
+					None)
+				f.target = f
+				self.frames.append(f)
+				return
+			if target is not None:
+				target.req |= req
+			self.frames.append(_Frame(None, 0, target))
+			return
+		if target is not None and 'transform' not in attrs:
+			target.req |= requirements(name, attrs, s)
+		self.frames.append(_Frame(None, 0, None))
+
+	def end_element(self, name):
+		self.styles.pop()
+		f = self.frames.pop()
+		if f.index is not None:
+			self.groups[f.index] = f.req
+
+	def scan_file(self, f):
+		self.parser = ParserCreate()
+		self.parser.StartElementHandler = self.start_element
+		self.parser.EndElementHandler = self.end_element
+		try:
+			self.parser.ParseFile(f)
+		except ExpatError:
+			pass
+		self.parser = None
+		self.frames = []
+
+	def get_requirements(self, index):
+		'Get the requirements of a group, by byte index'
+		return self.groups.get(index, NEVER)
@@ -0,0 +1,393 @@
+#
+#   svgclean/geometry.py
+#
+#   This is a module to export the geometry of SVG documents.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from array import array
+import re
+from . import bbox
+from . import curve
+from . import path
+from . import props
+from . import style
+from . import transform
+from . import tree
+
+# Command codes.  All coordinates are absolute, in the user space of the
+# element; arcs are converted to cubic curves.
+MOVE = 0	# (x, y)
+LINE = 1	# (x, y)
+QUAD = 2	# (x1, y1, x, y)
+CUBIC = 3	# (x1, y1, x2, y2, x, y)
+CLOSE = 4	# ()
+
+# Number of coordinates for each command code
+COORDS = (2, 2, 4, 6, 0)
+
+# Elements which are not rendered where they are declared
+_NOT_RENDERED = ('defs', 'clipPath', 'mask', 'marker', 'pattern', 'symbol')
+
+_SHAPES = ('path', 'rect', 'circle', 'ellipse', 'line', 'polyline', 'polygon')
+
+_NUMBER_RE = re.compile(r'[+-]?(?:\d+\.\d*|\d*\.\d+|\d+)(?:[eE][+-]?\d+)?')
+
+# Cubic control point distance for a quarter circle of radius 1
+_KAPPA = 0.5522847498307936
+
+class Geometry(object):
+	'Geometry of a document, stored in flat typed arrays'
+
+	def __init__(self):
+		self.commands = array('B')	# command code of each segment
+		self.segments = array('i')	# element index of each segment
+		self.coords = array('d')	# coordinates of all segments
+		self.names = []			# name of each element
+		self.starts = array('i')	# first segment of each element
+		self.matrices = array('d')	# 6 matrix values per element
+		self.styles = array('i')	# style index of each element
+		self.style_table = []		# computed style dictionaries
+		self._style_index = {}
+
+	def __len__(self):
+		return len(self.names)
+
+	def element_segments(self, i):
+		'Get the range of segments for one element'
+		if i + 1 < len(self.starts):
+			return range(self.starts[i], self.starts[i + 1])
+		else:
+			return range(self.starts[i], len(self.commands))
+
+	def _intern_style(self, s):
+		key = tuple(s.get_prop(p) for p in props.NAMES)
+		i = self._style_index.get(key)
+		if i is None:
+			i = len(self.style_table)
+			self.style_table.append(dict((p, v) for p, v in
+				zip(props.NAMES, key) if v is not None))
+			self._style_index[key] = i
+		return i
+
+	def begin_element(self, name, mtx, s):
+		self.names.append(name)
+		self.starts.append(len(self.commands))
+		self.matrices.extend(mtx.m)
+		self.styles.append(self._intern_style(s))
+
+	def _command(self, code):
+		self.commands.append(code)
+		self.segments.append(len(self.names) - 1)
+
+	def move(self, x, y):
+		self._command(MOVE)
+		self.coords.append(x)
+		self.coords.append(y)
+
+	def line(self, x, y):
+		self._command(LINE)
+		self.coords.append(x)
+		self.coords.append(y)
+
+	def quad(self, x1, y1, x, y):
+		self._command(QUAD)
+		self.coords.extend((x1, y1, x, y))
+
+	def cubic(self, x1, y1, x2, y2, x, y):
+		self._command(CUBIC)
+		self.coords.extend((x1, y1, x2, y2, x, y))
+
+	def close(self):
+		self._command(CLOSE)
+
+	def arc(self, x0, y0, values):
+		a = curve.arc_center((x0, y0), values)
+		if a is None:
+			self.line(values[5], values[6])
+		else:
+			for c in curve.ellipse_cubics(*a):
+				self.cubic(*c)
+
+	def add_path(self, geometry):
+		'Add path data to the current element'
+		commands = self.commands.append
+		segments = self.segments.append
+		coords = self.coords.extend
+		elem = len(self.names) - 1
+		x = y = sx = sy = 0.0
+		rx = ry = 0.0		# reflected control point
+		prev = ''
+		for letter, params in path.PATH_RE.findall(geometry):
+			v = [float(n) for n in _NUMBER_RE.findall(params)]
+			u = letter.upper()
+			rel = letter != u
+			n = path.PathCommand.parameter_count(letter)
+			if n == 0:
+				self.close()
+				x = sx
+				y = sy
+				prev = u
+				continue
+			if len(v) % n:
+				raise path.InvalidPathError(letter + params)
+			for i in range(0, len(v), n):
+				dx = x if rel else 0.0
+				dy = y if rel else 0.0
+				if u == 'M':
+					x = sx = v[i] + dx
+					y = sy = v[i + 1] + dy
+					self.move(x, y)
+					u = 'L'
+					prev = 'M'
+					continue
+				elif u in 'LHV':
+					if u == 'L':
+						x = v[i] + dx
+						y = v[i + 1] + dy
+					elif u == 'H':
+						x = v[i] + dx
+					else:
+						y = v[i] + dy
+					commands(LINE)
+					segments(elem)
+					coords((x, y))
+				elif u in 'CS':
+					if u == 'C':
+						x1 = v[i] + dx
+						y1 = v[i + 1] + dy
+						i += 2
+					elif prev in 'CS':
+						x1 = 2 * x - rx
+						y1 = 2 * y - ry
+					else:
+						x1 = x
+						y1 = y
+					rx = v[i] + dx
+					ry = v[i + 1] + dy
+					x = v[i + 2] + dx
+					y = v[i + 3] + dy
+					commands(CUBIC)
+					segments(elem)
+					coords((x1, y1, rx, ry, x, y))
+				elif u in 'QT':
+					if u == 'Q':
+						rx = v[i] + dx
+						ry = v[i + 1] + dy
+						i += 2
+					elif prev in 'QT':
+						rx = 2 * x - rx
+						ry = 2 * y - ry
+					else:
+						rx = x
+						ry = y
+					x = v[i] + dx
+					y = v[i + 1] + dy
+					commands(QUAD)
+					segments(elem)
+					coords((rx, ry, x, y))
+				elif u == 'A':
+					ex = v[i + 5] + dx
+					ey = v[i + 6] + dy
+					self.arc(x, y, v[i:i + 5] + [ex, ey])
+					x = ex
+					y = ey
+				prev = u
+			prev = u
+
+	def add_points(self, pts, closed):
+		'Add a points attribute to the current element'
+		v = [float(n) for n in _NUMBER_RE.findall(pts)]
+		for i in range(0, len(v) - 1, 2):
+			if i:
+				self.line(v[i], v[i + 1])
+			else:
+				self.move(v[i], v[i + 1])
+		if closed and v:
+			self.close()
+
+	def add_ellipse(self, cx, cy, rx, ry):
+		'Add an ellipse to the current element'
+		kx = rx * _KAPPA
+		ky = ry * _KAPPA
+		self.move(cx + rx, cy)
+		self.cubic(cx + rx, cy + ky, cx + kx, cy + ry, cx, cy + ry)
+		self.cubic(cx - kx, cy + ry, cx - rx, cy + ky, cx - rx, cy)
+		self.cubic(cx - rx, cy - ky, cx - kx, cy - ry, cx, cy - ry)
+		self.cubic(cx + kx, cy - ry, cx + rx, cy - ky, cx + rx, cy)
+		self.close()
+
+	def add_rect(self, x, y, w, h, rx, ry):
+		'Add a rectangle to the current element'
+		rx = min(rx, w / 2.0)
+		ry = min(ry, h / 2.0)
+		if rx <= 0 or ry <= 0:
+			self.move(x, y)
+			self.line(x + w, y)
+			self.line(x + w, y + h)
+			self.line(x, y + h)
+			self.close()
+			return
+		kx = rx * (1 - _KAPPA)
+		ky = ry * (1 - _KAPPA)
+		r = x + w
+		b = y + h
+		self.move(x + rx, y)
+		self.line(r - rx, y)
+		self.cubic(r - kx, y, r, y + ky, r, y + ry)
+		self.line(r, b - ry)
+		self.cubic(r, b - ky, r - kx, b, r - rx, b)
+		self.line(x + rx, b)
+		self.cubic(x + kx, b, x, b - ky, x, b - ry)
+		self.line(x, y + ry)
+		self.cubic(x, y + ky, x + kx, y, x + rx, y)
+		self.close()
+
+def _length(attrs, name, default):
+	v = bbox.parse_length(attrs.get(name, default))
+	if v is None:
+		raise ValueError(name)
+	return v
+
+def _rect_radii(attrs):
+	rx = attrs.get('rx')
+	ry = attrs.get('ry')
+	if rx is None:
+		rx = ry
+	if ry is None:
+		ry = rx
+	if rx is None:
+		return 0.0, 0.0
+	return bbox.parse_length(rx) or 0.0, bbox.parse_length(ry) or 0.0
+
+def add_shape(g, name, attrs):
+	'Add the geometry of one shape element'
+	if name == 'path':
+		g.add_path(attrs.get('d', ''))
+	elif name == 'polyline':
+		g.add_points(attrs.get('points', ''), False)
+	elif name == 'polygon':
+		g.add_points(attrs.get('points', ''), True)
+	elif name == 'line':
+		g.move(_length(attrs, 'x1', '0'), _length(attrs, 'y1', '0'))
+		g.line(_length(attrs, 'x2', '0'), _length(attrs, 'y2', '0'))
+	elif name == 'rect':
+		rx, ry = _rect_radii(attrs)
+		g.add_rect(_length(attrs, 'x', '0'), _length(attrs, 'y', '0'),
+			_length(attrs, 'width', ''),
+			_length(attrs, 'height', ''), rx, ry)
+	elif name == 'circle':
+		r = _length(attrs, 'r', '')
+		g.add_ellipse(_length(attrs, 'cx', '0'),
+			_length(attrs, 'cy', '0'), r, r)
+	elif name == 'ellipse':
+		g.add_ellipse(_length(attrs, 'cx', '0'),
+			_length(attrs, 'cy', '0'), _length(attrs, 'rx', ''),
+			_length(attrs, 'ry', ''))
+
+def _href(attrs):
+	for a in attrs:
+		if a.split(':')[-1] == 'href':
+			v = attrs[a].strip()
+			if v.startswith('#'):
+				return v[1:]
+
+class _Exporter(object):
+	"""Exporter of the shapes in a document tree.  Elements referenced by
+	use elements are expanded where they are used."""
+
+	def __init__(self, doc, warn):
+		self.geometry = Geometry()
+		self.warn = warn
+		self.ids = {}
+		for node in tree.walk(doc.root):
+			ident = node.get('id')
+			if ident is not None:
+				self.ids.setdefault(ident, node)
+
+	def export(self, node, s, m):
+		# Entries are (node, parent style, parent matrix, hidden, ids of
+		# ancestors and of the elements expanded by use)
+		stack = [(node, s, m, False, ())]
+		while stack:
+			node, s, m, hidden, chain = stack.pop()
+			name = node.local_name()
+			attrs = node.attr_dict()
+			s = style.Style(s, attrs, warn=self.warn)
+			try:
+				m = transform.parse(m, attrs)
+			except transform.InvalidTransformError:
+				self.warn('Invalid transform: %s' %
+					attrs.get('transform'))
+			if name in _NOT_RENDERED:
+				hidden = True
+			elif hidden:
+				pass
+			elif name == 'use':
+				stack.extend(self._use(attrs, s, m, chain))
+				continue
+			elif name in _SHAPES:
+				g = self.geometry
+				g.begin_element(name, m, s)
+				try:
+					add_shape(g, name, attrs)
+				except (KeyError, ValueError,
+				        path.InvalidPathError):
+					self.warn('Invalid shape: %s' % name)
+			if 'id' in attrs:
+				chain += (attrs['id'],)
+			for c in reversed(node.nodes()):
+				stack.append((c, s, m, hidden, chain))
+
+	def _use(self, attrs, s, m, chain):
+		'''Get the stack entries to expand a use element.  Circular
+		references are not expanded.'''
+		ident = _href(attrs)
+		target = self.ids.get(ident)
+		if target is None or ident in chain:
+			return ()
+		try:
+			x = _length(attrs, 'x', '0')
+			y = _length(attrs, 'y', '0')
+		except ValueError:
+			return ()
+		m = transform.Matrix(m.m)
+		m.translate(x, y)
+		chain += (ident,)
+		if target.local_name() == 'symbol':
+			# Symbols are only rendered by use elements
+			s = style.Style(s, target.attr_dict(), warn=self.warn)
+			return [(c, s, m, False, chain)
+				for c in reversed(target.nodes())]
+		return [(target, s, m, False, chain)]
+
+def _ignore(msg):
+	pass
+
+def export(f, warn=None):
+	"""Export the geometry of all rendered shapes in an SVG file object.
+	Use elements are expanded; warnings about invalid styles or shapes
+	are passed to warn, if given."""
+	doc = tree.TreeBuilder(float('inf'), False, False).build(f)
+	if doc.root is None:
+		return Geometry()
+	e = _Exporter(doc, warn or _ignore)
+	e.export(doc.root, style.ROOT, transform.Matrix())
+	return e.geometry
+
+def export_file(fname, warn=None):
+	'Export the geometry of all rendered shapes in an SVG file'
+	f = open(fname, 'br')
+	try:
+		return export(f, warn)
+	finally:
+		f.close()
@@ -0,0 +1,154 @@
+#
+#   svgclean/merge.py
+#
+#   This is a module to merge sibling paths with the same style.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from . import bbox
+from . import color
+from . import opacity
+from . import path
+from . import props
+
+# Maximum number of paths held back for merging
+MAX_PATHS = 64
+
+# Maximum total length of path data held back for merging
+MAX_LENGTH = 65536
+
+# Attributes allowed on a path which can be merged
+_MERGEABLE = ('d', 'style') + props.NAMES
+
+# Styles which depend on the bounds or the number of paths
+_UNMERGEABLE_STYLES = ('marker', 'marker-start', 'marker-mid', 'marker-end',
+	'filter', 'clip-path', 'mask')
+
+_OPACITY_STYLES = ('opacity', 'fill-opacity', 'stroke-opacity')
+
+def _is_none(value):
+	return value is None or value == 'none'
+
+def _is_paint_server(value):
+	return value is not None and value.startswith('url(')
+
+def is_candidate(name, attrs, style):
+	'Check if a path can be merged with its siblings'
+	if name != 'path' or 'd' not in attrs:
+		return False
+	for a in attrs:
+		if a not in _MERGEABLE:
+			return False
+	for p in _UNMERGEABLE_STYLES:
+		if not _is_none(style.get_prop(p)):
+			return False
+	if not _is_none(style.get_prop('stroke-dasharray')):
+		return False
+	return not (_is_paint_server(style.get_prop('fill')) or
+	            _is_paint_server(style.get_prop('stroke')))
+
+def _is_translucent(style, p):
+	v = style.get_prop(p)
+	if v is not None and v.strip().lower() == 'currentcolor':
+		v = style.get_prop('color')
+	if v is None:
+		return False
+	c = color.parse(v)
+	return c is not None and c[1] < 1
+
+def _can_overlap(style):
+	'Check if paths with a style can overlap after merging'
+	if not _is_none(style.get_prop('fill')):
+		return False
+	for p in ('fill', 'stroke'):
+		if _is_translucent(style, p):
+			return False
+	for p in _OPACITY_STYLES:
+		v = style.get_prop(p)
+		try:
+			if v is not None and opacity.normalize(v) != '1':
+				return False
+		except ValueError:
+			return False
+	return True
+
+def move_absolute(geometry):
+	'Make the initial move command of path geometry absolute'
+	g = geometry.lstrip()
+	if not g.startswith('m'):
+		return g
+	values = path.SPLIT_RE.finditer(g)
+	try:
+		next(values)
+		y = next(values)
+	except StopIteration:
+		return g
+	return 'M' + g[1:y.end()] + 'l' + g[y.end():]
+
+def _attrs_key(attrs):
+	return frozenset((a, attrs[a]) for a in attrs if a != 'd')
+
+class PathGroup(object):
+	'Group of sibling paths to be merged into one path'
+
+	def __init__(self, attrs, style, depth, mtx):
+		self.key = _attrs_key(attrs)
+		self.attrs = attrs
+		self.depth = depth
+		self.mtx = mtx
+		self.overlap = _can_overlap(style)
+		self.extent = bbox.stroke_extent(style, mtx)
+		self.bounds = []
+		self.parts = []
+		self.length = 0
+
+	def _bounds(self, geometry):
+		try:
+			b = bbox.path_bounds(geometry, self.mtx)
+		except path.InvalidPathError:
+			return None
+		if self.extent is None:
+			return None
+		b.inflate(self.extent)
+		return b
+
+	def accepts(self, attrs, depth, mtx):
+		'Check if a sibling path can be merged into the group'
+		if depth != self.depth or mtx.m != self.mtx.m:
+			return False
+		if _attrs_key(attrs) != self.key:
+			return False
+		if len(self.parts) >= MAX_PATHS:
+			return False
+		if self.length + len(attrs['d']) > MAX_LENGTH:
+			return False
+		if self.overlap:
+			return True
+		b = self._bounds(attrs['d'])
+		if b is None:
+			return False
+		for other in self.bounds:
+			if other is None or b.intersects(other):
+				return False
+		return True
+
+	def add(self, geometry):
+		if self.parts:
+			self.parts.append(move_absolute(geometry))
+		else:
+			self.parts.append(geometry)
+		if not self.overlap:
+			self.bounds.append(self._bounds(geometry))
+		self.length += len(geometry)
+
+	def geometry(self):
+		return ''.join(self.parts)
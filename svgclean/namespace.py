@@ -14,18 +14,37 @@
 #   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 #   included COPYING file for more details.
 #
-from .style import Style
+import os.path
+from configparser import ConfigParser
+from . import props
+
+# Namespace policies
+KEEP = 'keep'			# elements and listed attributes are valid
+STRIP_ATTRIBUTES = 'attributes'	# attributes are removed
+STRIP_SUBTREE = 'subtree'	# attributes and elements are removed
+
+_POLICIES = (KEEP, STRIP_ATTRIBUTES, STRIP_SUBTREE)
+
+# Registry of namespaces for editor metadata
+REGISTRY_FILE = os.path.join(os.path.dirname(__file__), 'namespaces.ini')
+
+class InvalidRegistryError(Exception):
+	pass
 
 class Namespace(object):
 
-	def __init__(self, uri, prefix, elements, attrib):
+	def __init__(self, uri, prefix, elements, attrib, policy=KEEP):
 		self.uri = uri
 		self.prefix = prefix		# customary prefix
 		self.elements = elements
 		self.attrib = attrib
+		self.policy = policy
 
 	def has_element(self, element):
-		return element in self.elements
+		if self.policy == KEEP:
+			return element in self.elements
+		else:
+			return self.policy == STRIP_ATTRIBUTES
 
 	def customary_attribs(self):
 		if self.prefix == 'svg':
@@ -68,7 +87,7 @@ SVG = Namespace('http://www.w3.org/2000/svg', 'svg',
 	# Namespace attributes -- is there a better way to handle these?
 	'xmlns:svg', 'xmlns:ns', 'xmlns:xlink', 'xmlns:rdf', 'xmlns:cc',
 	'xmlns:dc', 'xmlns:inkscape',
-) + Style.ALL)
+) + props.NAMES)
 
 XLINK = Namespace('http://www.w3.org/1999/xlink', 'xlink',
 (	# Elements
@@ -129,6 +148,24 @@ _KNOWN = {
 	INKSCAPE.uri: INKSCAPE,
 }
 
+def register(ns):
+	'Register a known namespace'
+	_KNOWN[ns.uri.strip('/').lower()] = ns
+
+def load_registry(fname):
+	'Register all namespaces declared in a registry file'
+	config = ConfigParser()
+	if not config.read(fname):
+		raise InvalidRegistryError(fname)
+	for prefix in config.sections():
+		sect = config[prefix]
+		policy = sect.get('policy', KEEP)
+		if 'uri' not in sect or policy not in _POLICIES:
+			raise InvalidRegistryError(prefix)
+		register(Namespace(sect['uri'], prefix,
+			tuple(sect.get('elements', '').split()),
+			tuple(sect.get('attributes', '').split()), policy))
+
 def lookup_xmlns(attrs):
 	decl = {}
 	for a in attrs:
@@ -154,10 +191,43 @@ def split_name(n):
 		prefix = ''
 	return prefix, name
 
+class Context(object):
+	'''Resolved namespaces of an element, with a map of prefix to namespace
+	and a rank for each known attribute (for output order).  A context is
+	shared by all descendants which declare no namespaces, so it must not
+	be changed after it is created.'''
+
+	def __init__(self, parent, spaces):
+		if parent is None:
+			self.prefixes = dict(spaces)
+			self.ranks = {}
+		else:
+			self.prefixes = dict(parent.prefixes)
+			self.prefixes.update(spaces)
+			self.ranks = dict(parent.ranks)
+		for prefix, ns in spaces.items():
+			for a in ns.customary_attribs():
+				self.ranks.setdefault(a, len(self.ranks))
+			if prefix and ns.policy == KEEP:
+				self.ranks.setdefault('xmlns:' + prefix,
+					len(self.ranks))
+
+	def ordered_attribs(self, attrs):
+		'Get the known attributes present, in output order'
+		ranks = self.ranks
+		return sorted((a for a in attrs if a in ranks), key=ranks.get)
+
+	def is_stripped(self, attr):
+		'Check if an attribute is removed by a namespace policy'
+		prefix, name = split_name(attr)
+		if prefix == 'xmlns':
+			prefix = name
+		ns = self.prefixes.get(prefix)
+		return ns is not None and ns.policy != KEEP
+
 class DeclaredNamespaces(object):
 	def __init__(self):
-		root = { '': SVG }
-		self.stack = [root]
+		self.stack = [Context(None, { '': SVG })]
 	def enter(self, attrs):
 		decl = lookup_xmlns(attrs)
 		spaces = {}
@@ -166,13 +236,21 @@ class DeclaredNamespaces(object):
 			ns = lookup_namespace(uri)
 			if ns:
 				spaces[prefix] = ns
-		self.stack.append(spaces)
+		self.enter_spaces(spaces)
+	def enter_spaces(self, spaces):
+		context = self.stack[-1]
+		if spaces:
+			context = Context(context, spaces)
+		self.stack.append(context)
+	def declare(self, attrs, ns):
+		'Declare a namespace with its customary prefix'
+		attrs['xmlns:' + ns.prefix] = ns.uri
 	def exit(self):
 		self.stack.pop()
+	def context(self):
+		return self.stack[-1]
 	def lookup_namespace(self, prefix):
-		for spaces in reversed(self.stack):
-			if prefix in spaces:
-				return spaces[prefix]
+		return self.stack[-1].prefixes.get(prefix)
 	def is_element_valid(self, element):
 		prefix, name = split_name(element)
 		ns = self.lookup_namespace(prefix)
@@ -189,3 +267,88 @@ class DeclaredNamespaces(object):
 			return name
 		else:
 			return ns.prefix + ':' + name
+
+load_registry(REGISTRY_FILE)
+
+# Separator of namespace URI and local name, for expat namespace processing
+SEPARATOR = ' '
+
+# Namespace of the xml prefix, which is never declared
+XML_URI = 'http://www.w3.org/XML/1998/namespace'
+
+class ExpatNamespaces(DeclaredNamespaces):
+	"""Namespaces resolved by expat.  Names are reported by expat as URI
+	and local name, and are translated to customary qualified names.
+	Elements in an unknown default namespace get a generated prefix."""
+
+	def __init__(self):
+		DeclaredNamespaces.__init__(self)
+		self.bound = { XML_URI: ['xml'] }
+		self.uris = {}
+		self.generated = {}
+		self.known = {}
+		self.pending = []
+		self.spaces = {}
+	def start_decl(self, prefix, uri):
+		self.uris.setdefault(prefix, []).append(uri)
+		if uri is not None:
+			self.bound.setdefault(uri, []).append(prefix)
+			self.pending.append(uri)
+	def end_decl(self, prefix):
+		uri = self.uris[prefix].pop()
+		if uri is not None:
+			self.bound[uri].pop()
+	def _prefix(self, uri):
+		prefixes = self.bound.get(uri)
+		if prefixes and prefixes[-1]:
+			return prefixes[-1]
+		prefix = self.generated.get(uri)
+		if prefix is None:
+			prefix = 'ns%d' % len(self.generated)
+			self.generated[uri] = prefix
+		return prefix
+	def qualify(self, name):
+		qname = self.known.get(name)
+		if qname is not None:
+			return qname
+		uri, sep, local = name.rpartition(SEPARATOR)
+		if not sep:
+			return name
+		ns = lookup_namespace(uri)
+		if ns is None:
+			return self._prefix(uri) + ':' + local
+		elif ns is SVG:
+			qname = local
+		else:
+			qname = ns.prefix + ':' + local
+		self.known[name] = qname
+		return qname
+	def qualify_attrs(self, attrs):
+		"""Translate attribute names, adding declarations of pending
+		namespaces with their customary prefixes"""
+		qattrs = {}
+		for a in attrs:
+			qattrs[self.qualify(a)] = attrs[a]
+		for uri in self.pending:
+			ns = lookup_namespace(uri)
+			if ns is SVG:
+				prefix = ''
+				qattrs['xmlns'] = uri
+			else:
+				if ns:
+					prefix = ns.prefix
+				else:
+					# Elements and attributes are unknown
+					prefix = self._prefix(uri)
+					ns = Namespace(uri, prefix, (), ())
+				qattrs['xmlns:' + prefix] = uri
+			self.spaces[prefix] = ns
+		self.pending = []
+		return qattrs
+	def declare(self, attrs, ns):
+		DeclaredNamespaces.declare(self, attrs, ns)
+		self.spaces[ns.prefix] = ns
+	def enter(self, attrs):
+		spaces = self.spaces
+		self.spaces = {}
+		self.enter_spaces(spaces)
@@ -14,17 +14,8 @@
 #   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 #   included COPYING file for more details.
 #
-import sys
 from . import format
 
-STYLES = (
-	'opacity',
-	'fill-opacity',
-	'stroke-opacity',
-	'flood-opacity',
-	'stop-opacity',
-)
-
 def validate(value):
 	'Check value is a valid opacity'
 	float(value.rstrip('%'))
@@ -40,6 +31,3 @@ def normalize(value):
 	else:
 		v = float(value)
 	return _range_clamp(v, 0, 1, 3)
-
-def compress(name, value):
-	return name in STYLES and value == 1
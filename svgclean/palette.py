@@ -0,0 +1,109 @@
+#
+#   svgclean/palette.py
+#
+#   This is a module to merge similar colors in a document.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from xml.parsers.expat import ParserCreate, ExpatError
+from math import sqrt
+from . import color
+
+# Color styles which are merged
+STYLES = ('fill', 'stroke', 'stop-color')
+
+def _linear(c):
+	c /= 255.0
+	if c <= 0.04045:
+		return c / 12.92
+	return ((c + 0.055) / 1.055) ** 2.4
+
+def _lab_f(t):
+	if t > 216 / 24389.0:
+		return t ** (1 / 3.0)
+	return (24389 / 27.0 * t + 16) / 116
+
+def lab(rgb):
+	'Convert an rgb value to CIE L*a*b* (D65 white point)'
+	r = _linear(rgb >> 16)
+	g = _linear((rgb >> 8) & 0xff)
+	b = _linear(rgb & 0xff)
+	x = (0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047
+	y = 0.2126 * r + 0.7152 * g + 0.0722 * b
+	z = (0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883
+	fx = _lab_f(x)
+	fy = _lab_f(y)
+	fz = _lab_f(z)
+	return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+def _distance(p, q):
+	return sqrt(sum((a - b) ** 2 for a, b in zip(p, q)))
+
+def _values(attrs):
+	for p in STYLES:
+		if p in attrs:
+			yield attrs[p].strip()
+	for s in attrs.get('style', '').split(';'):
+		p, _, v = s.partition(':')
+		if p.strip() in STYLES:
+			yield v.strip()
+
+class Palette(object):
+	'''Palette of colors used in a document.  Colors within a tolerance
+	(CIE76 delta E) are merged into the most frequent color nearby.'''
+
+	def __init__(self, tolerance):
+		self.tolerance = tolerance
+		self.counts = {}
+		self.colors = {}
+
+	def start_element(self, name, attrs):
+		for v in _values(attrs):
+			self.counts[v] = self.counts.get(v, 0) + 1
+
+	def scan_file(self, f):
+		parser = ParserCreate()
+		parser.StartElementHandler = self.start_element
+		try:
+			parser.ParseFile(f)
+		except ExpatError:
+			pass
+		self._cluster()
+
+	def _histogram(self):
+		hist = {}
+		for v, n in self.counts.items():
+			rgb = color.normalize_to_int(v)
+			if rgb is not None:
+				hist[rgb] = hist.get(rgb, 0) + n
+		return hist
+
+	def _cluster(self):
+		hist = self._histogram()
+		reps = []
+		# Most frequent colors first, then shortest
+		for rgb, n in sorted(hist.items(), key=lambda cn: (-cn[1],
+		    len(color.shortest(cn[0])), cn[0])):
+			c = lab(rgb)
+			for r, rc in reps:
+				if _distance(c, rc) <= self.tolerance:
+					self.colors[rgb] = r
+					break
+			else:
+				reps.append((rgb, c))
+
+	def lookup(self, value):
+		'Get the replacement for a color value'
+		rep = self.colors.get(color.normalize_to_int(value))
+		if rep is None:
+			return value
+		return color.shortest(rep)
@@ -0,0 +1,276 @@
+#
+#   svgclean/passes.py
+#
+#   This is a module for the pipeline of passes which transform elements.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from time import perf_counter
+from . import format
+from . import path
+from . import points
+from . import shape
+
+# Phases of element processing
+RENAME = 'rename'	# before style and transform processing
+CONVERT = 'convert'	# after style and transform processing
+
+class Pass(object):
+	'''Base class of passes.  A pass declares the elements and attributes
+	it handles (None for all); it is only called for elements with one of
+	its names and one of its attributes.  Element events are transformed
+	by start_element, and attribute values by attribute.'''
+	name = None
+	phase = CONVERT
+	elements = None
+	attributes = None
+
+	def start_element(self, cleaner, name, attrs):
+		'Transform an element start event, returning the element name'
+		return name
+
+	def attribute(self, cleaner, elem, attr, value):
+		'Transform an attribute value before it is written'
+		return value
+
+# Factories of passes, in pipeline order
+REGISTRY = []
+
+def register(factory):
+	'''Register a pass factory.  When a file is cleaned, the factory is
+	called with the cleaner, and returns a pass (or None if the pass is
+	not needed).  Passes run in the order they are registered.'''
+	REGISTRY.append(factory)
+
+def _overrides(p, method):
+	return getattr(type(p), method) is not getattr(Pass, method)
+
+class _Timer(object):
+	__slots__ = ('name', 'calls', 'elapsed')
+
+	def __init__(self, name):
+		self.name = name
+		self.calls = 0
+		self.elapsed = 0.0
+
+class Pipeline(object):
+	'''Ordered pipeline of passes.  The passes interested in each element
+	(or attribute) name are found once, and cached.  When timed, the
+	time of each pass is recorded.'''
+
+	def __init__(self, passes=(), timed=False):
+		self.passes = tuple(passes)
+		self.timed = timed
+		self.timers = dict((p, _Timer(p.name or type(p).__name__))
+			for p in self.passes)
+		self.elements = {}
+		self.attributes = {}
+
+	def _interested(self, phase, name):
+		key = (phase, name)
+		passes = self.elements.get(key)
+		if passes is None:
+			passes = tuple(p for p in self.passes if p.phase == phase
+				and _overrides(p, 'start_element') and
+				(p.elements is None or name in p.elements))
+			self.elements[key] = passes
+		return passes
+
+	def _call(self, p, func, *args):
+		if not self.timed:
+			return func(*args)
+		start = perf_counter()
+		try:
+			return func(*args)
+		finally:
+			t = self.timers[p]
+			t.calls += 1
+			t.elapsed += perf_counter() - start
+
+	def start_element(self, phase, cleaner, name, attrs):
+		'Run the passes of one phase on an element start event'
+		passes = self._interested(phase, name)
+		i = 0
+		while i < len(passes):
+			p = passes[i]
+			i += 1
+			if p.attributes is not None and \
+			   not any(a in attrs for a in p.attributes):
+				continue
+			n = self._call(p, p.start_element, cleaner, name, attrs)
+			if n != name:
+				# Later passes are chosen by the new name
+				name = n
+				rest = passes[i:]
+				passes = tuple(q for q in
+					self._interested(phase, name) if q in rest)
+				i = 0
+		return name
+
+	def attribute(self, cleaner, elem, attr, value):
+		'Run the passes interested in an attribute on its value'
+		passes = self.attributes.get(attr)
+		if passes is None:
+			passes = tuple(p for p in self.passes
+				if _overrides(p, 'attribute') and
+				(p.attributes is None or attr in p.attributes))
+			self.attributes[attr] = passes
+		for p in passes:
+			if p.elements is None or elem in p.elements:
+				value = self._call(p, p.attribute, cleaner, elem,
+					attr, value)
+		return value
+
+	def report(self):
+		'Get a report of the time spent in each pass'
+		lines = []
+		for p in self.passes:
+			t = self.timers[p]
+			lines.append('Pass %s: %d calls, %.3f s' % (t.name,
+				t.calls, t.elapsed))
+		return lines
+
+def build(cleaner):
+	'Build the pipeline of registered passes for a cleaner'
+	passes = []
+	for factory in REGISTRY:
+		p = factory(cleaner)
+		if p is not None:
+			passes.append(p)
+	return Pipeline(passes, cleaner.options.verbose)
+
+class ReusePass(Pass):
+	'Replace repeated paths with use elements'
+	name = 'reuse'
+	phase = RENAME
+	elements = ('path',)
+	attributes = ('d',)
+
+	def __init__(self, reuse):
+		self.reuse = reuse
+
+	def start_element(self, cleaner, name, attrs):
+		return self.reuse.replace_path(name, attrs)
+
+class PrefixPass(Pass):
+	'Use customary namespace prefixes'
+	name = 'prefix'
+	phase = RENAME
+
+	def start_element(self, cleaner, name, attrs):
+		return cleaner.spaces.get_customary_name(name)
+
+class PolyPass(Pass):
+	'Convert polygon and polyline elements to paths'
+	name = 'poly'
+	phase = RENAME
+	elements = ('polygon', 'polyline')
+	attributes = ('points',)
+
+	def start_element(self, cleaner, name, attrs):
+		pts = attrs.pop('points')
+		attrs['d'] = points.convert_to_path(pts, name == 'polygon',
+			cleaner.options.tolerance)
+		return 'path'
+
+class UseTransformPass(Pass):
+	'Apply transforms to use elements which refer to reused paths'
+	name = 'use-transform'
+	elements = ('use',)
+	attributes = ('xlink:href',)
+
+	def start_element(self, cleaner, name, attrs):
+		href = attrs['xlink:href']
+		if cleaner._is_reused(href[1:]):
+			m = cleaner.matrices[-1]
+			if m.m[:4] == (1, 0, 0, 1):
+				x, y = m.transform_point(float(attrs.get('x', 0)),
+					float(attrs.get('y', 0)))
+				digits = cleaner.options.digits
+				attrs['x'] = format.from_number(x, digits)
+				attrs['y'] = format.from_number(y, digits)
+			elif not m.is_identity():
+				attrs['transform'] = str(m)
+		return name
+
+def _path_size(cleaner, geometry):
+	n = len(''.join(path.split_tokens(geometry, cleaner.options,
+		cleaner.matrices[-1])))
+	return len("path d=''") + n
+
+def _shape_size(name, attrs):
+	n = len(name)
+	for a in shape.ATTRIBS[name]:
+		if a in attrs:
+			n += len(" %s=''" % a) + len(attrs[a])
+	return n
+
+class ShapePass(Pass):
+	'Convert basic shapes to paths (or paths to shapes), if shorter'
+	name = 'shape'
+	elements = tuple(shape.ATTRIBS) + ('path',)
+
+	def start_element(self, cleaner, name, attrs):
+		if not attrs:
+			return name
+		s = cleaner.styles[-1]
+		m = cleaner.matrices[-1]
+		transform = cleaner.options.transform
+		if name in shape.ATTRIBS:
+			d = shape.shape_path(name, attrs, s)
+			if d is None:
+				return name
+			# Transforms are only applied to path data
+			if not (transform and not m.is_identity()):
+				if _path_size(cleaner, d) >= _shape_size(name,
+				   attrs):
+					return name
+			for a in shape.ATTRIBS[name]:
+				attrs.pop(a, None)
+			attrs['d'] = d
+			return 'path'
+		elif 'd' in attrs and 'id' not in attrs:
+			if transform and not m.is_identity():
+				return name
+			sh = shape.path_shape(attrs['d'], s,
+				cleaner.options.digits)
+			if sh is None:
+				return name
+			n, a = sh
+			try:
+				size = _path_size(cleaner, attrs['d'])
+			except path.InvalidPathError:
+				return name
+			if _shape_size(n, a) >= size:
+				return name
+			del attrs['d']
+			attrs.update(a)
+			return n
+		return name
+
+class SimplifyPass(Pass):
+	'Simplify path data within a tolerance'
+	name = 'simplify'
+	attributes = ('d',)
+
+	def attribute(self, cleaner, elem, attr, value):
+		try:
+			return path.simplify(value, cleaner.options.tolerance)
+		except (ValueError, path.InvalidPathError):
+			return value
+
+register(lambda c: ReusePass(c.reuse) if c.reuse else None)
+register(lambda c: PrefixPass() if c.options.prefix else None)
+register(lambda c: PolyPass() if c.options.poly else None)
+register(lambda c: UseTransformPass() if c.options.transform else None)
+register(lambda c: ShapePass() if c.options.basic else None)
+register(lambda c: SimplifyPass() if c.options.tolerance else None)
@@ -17,6 +17,7 @@
 import re
 import sys
 from . import format
+from . import curve
 
 PATH_RE = re.compile('([MmLlHhVvAaQqTtCcSsZz])([^MmLlHhVvAaQqTtCcSsZz]*)')
 SPLIT_RE = re.compile('([+-]?(\d+\.\d*|\d*\.\d+|\d+)([eE][+-]?\d+)?)')
@@ -118,6 +119,17 @@ class PathCommand(object):
 		else:
 			return self._get_pen_relative()
 
+	def get_pen_subpath(self, start):
+		'Get pen and subpath start after the command is done'
+		l = self.letter.upper()
+		if l == 'M':
+			pen = self.get_pen_done()
+			return pen, pen
+		elif l == 'Z':
+			return start, start
+		else:
+			return self.get_pen_done(), start
+
 	def get_reflected_point(self):
 		if self.letter.upper() in 'CSQ':
 			xd = self.fvalue(-2) - self.fvalue(-4)
@@ -166,6 +178,13 @@ class PathCommand(object):
 		assert self.letter == 'v'
 		self.values = [self.pen[1] + float(y) for y in self.values]
 
+	def _to_absolute_arc(self):
+		assert self.letter == 'a'
+		x, y = self.values[-2:]
+		x = self.pen[0] + float(x)
+		y = self.pen[1] + float(y)
+		self.values[-2:] = [x, y]
+
 	def _to_absolute(self):
 		if self.is_command_pairs():
 			self._to_absolute_pairs()
@@ -247,17 +266,22 @@ class PathCommand(object):
 		self.values = values
 		self.letter = 'L'
 
+	def _transform_arc(self, mtx):
+		values = curve.transform_arc(self.get_values(), mtx.m)
+		values[5:] = mtx.transform_point(values[5], values[6])
+		self.values = values
+
 	def transform(self, mtx):
 		self.set_absolute(True)
 		if self.letter == 'H':
 			self._to_horiz_line()
 		if self.letter == 'V':
 			self._to_vert_line()
-		if self.letter == 'A':
-			raise InvalidPathError(
-			    'FIXME: transforming arcs not implemented')
 		if self.pen is not PathCommand.ORIGIN:
 			self.pen = mtx.transform_point(*self.pen)
+		if self.letter == 'A':
+			self._transform_arc(mtx)
+			return
 		xv = [float(x) for x in self.values[::2]]
 		yv = [float(y) for y in self.values[1::2]]
 		values = []
@@ -300,7 +324,7 @@ def split_commands(geometry):
 
 def split_tokens(geometry, options, mtx):
 	epsilon = calculate_epsilon(options.digits)
-	pen = PathCommand.ORIGIN
+	pen = start = PathCommand.ORIGIN
 	reflected = None
 	prev_letter = '~'	# Tilde character never used
 	for command in split_commands(geometry):
@@ -308,7 +332,7 @@ def split_tokens(geometry, options, mtx):
 		if options.bezier:
 			command.test_reflected(reflected, epsilon)
 		reflected = command.get_reflected_point()
-		pen = command.get_pen_done()
+		pen, start = command.get_pen_subpath(start)
 		if options.transform:
 			command.transform(mtx)
 		command.set_absolute(options.absolute)
@@ -320,19 +344,148 @@ def split_tokens(geometry, options, mtx):
 			prev_letter = c[0]
 			yield c
 
-def split_values(geometry):
-	pen = PathCommand.ORIGIN
-	reflected = None
+def transform(geometry, mtx):
+	'Apply a matrix to path geometry'
+	pen = start = PathCommand.ORIGIN
+	cmnds = []
+	for command in split_commands(geometry):
+		command.set_pen(pen)
+		pen, start = command.get_pen_subpath(start)
+		command.transform(mtx)
+		cmnds.append(command.get_command(None))
+	return ''.join(cmnds)
+
+def _reflect(pen, ctrl):
+	return (2 * pen[0] - ctrl[0], 2 * pen[1] - ctrl[1])
+
+def _split_absolute(geometry):
+	"""Split path geometry into (letter, values, smooth) tuples, with
+	absolute values.  Smooth curves are expanded, and their original
+	values are included (otherwise None).  The control point of a smooth
+	curve is reflected only from a curve of the same family; otherwise
+	it is the current point."""
+	pen = start = PathCommand.ORIGIN
+	family = ctrl = None
 	for command in split_commands(geometry):
 		command.set_pen(pen)
-		pen = command.get_pen_done()
+		pen, start = command.get_pen_subpath(start)
 		l = command.letter.upper()
 		command.set_absolute(True)
 		pts = command.get_values()
-		if l == 'S':
-			yield ('C', list(reflected) + pts)
-		elif l == 'T':
-			yield ('Q', list(reflected) + pts)
+		smooth = None
+		if l in 'ST':
+			smooth = pts
+			l = l == 'S' and 'C' or 'Q'
+			if family == l:
+				p1 = _reflect(command.pen, ctrl)
+			else:
+				p1 = command.pen
+			pts = list(p1) + pts
+		if l == 'C':
+			family, ctrl = l, (pts[2], pts[3])
+		elif l == 'Q':
+			family, ctrl = l, (pts[0], pts[1])
 		else:
-			yield (l, pts)
-		reflected = command.get_reflected_point()
+			family = ctrl = None
+		yield (l, pts, smooth)
+
+def split_values(geometry):
+	for letter, pts, smooth in _split_absolute(geometry):
+		yield (letter, pts)
+
+def _original(letter, pts, smooth, kept):
+	"""Get an unsimplified command.  A smooth curve is only kept if the
+	previous command was kept, since its control point is reflected."""
+	if smooth is not None and kept:
+		return (letter == 'C' and 'S' or 'T', smooth)
+	return (letter, pts)
+
+def _flush_cubics(cmnds, cubics, tolerance, kept):
+	"""Fit and reduce a run of cubics.  The tolerance is split between
+	fitting and reduction, since their errors add up.  Returns whether
+	the last command is unsimplified."""
+	if not cubics:
+		return kept
+	originals = dict((id(c), (pts, smooth)) for c, pts, smooth in cubics)
+	half = tolerance / 2.0
+	for c in curve.fit_cubics([c for c, pts, smooth in cubics], half):
+		p0, p1, p2, p3 = c
+		if curve.is_flat_cubic(c, half):
+			cmnds.append(('L', p3))
+			kept = False
+			continue
+		q = curve.reduce_cubic(c, half)
+		if q:
+			cmnds.append(('Q', q + p3))
+			kept = False
+		elif id(c) in originals:
+			pts, smooth = originals[id(c)]
+			cmnds.append(_original('C', pts, smooth, kept))
+			kept = True
+		else:
+			cmnds.append(('C', p1 + p2 + p3))
+			kept = False
+	del cubics[:]
+	return kept
+
+def simplify(geometry, tolerance):
+	'Simplify curves in path geometry within an error tolerance'
+	cmnds = []
+	cubics = []
+	kept = False
+	pen = start = PathCommand.ORIGIN
+	for letter, pts, smooth in _split_absolute(geometry):
+		if letter == 'C':
+			p3 = (pts[4], pts[5])
+			cubics.append(((pen, (pts[0], pts[1]),
+				(pts[2], pts[3]), p3), pts, smooth))
+			pen = p3
+			continue
+		kept = _flush_cubics(cmnds, cubics, tolerance, kept)
+		if letter == 'Q':
+			p1 = (pts[0], pts[1])
+			p2 = (pts[2], pts[3])
+			if curve.is_flat_quadratic(pen, p1, p2, tolerance):
+				cmnds.append(('L', p2))
+				kept = False
+			else:
+				cmnds.append(_original(letter, pts, smooth, kept))
+				kept = True
+			pen = p2
+			continue
+		cmnds.append((letter, pts))
+		kept = True
+		if letter == 'M':
+			start = pen = (pts[0], pts[1])
+		elif letter == 'Z':
+			pen = start
+		elif letter == 'H':
+			pen = (pts[0], pen[1])
+		elif letter == 'V':
+			pen = (pen[0], pts[0])
+		else:
+			pen = (pts[-2], pts[-1])
+	_flush_cubics(cmnds, cubics, tolerance, kept)
+	return ''.join(letter + ' '.join(format.from_number(v, None)
+		for v in values) for letter, values in cmnds)
+
+def _check(geometry, expected):
+	v = [(letter, pts) for letter, pts in split_values(geometry)]
+	assert v == expected, (geometry, v)
+	print('%s\t%s' % (simplify(geometry, 0.1), geometry))
+
+if __name__ == '__main__':
+	_check('M0 0Q10 10 20 0T40 0T60 0', [('M', [0, 0]),
+		('Q', [10, 10, 20, 0]), ('Q', [30, -10, 40, 0]),
+		('Q', [50, 10, 60, 0])])
+	_check('m0 0q10 10 20 0t20 0 20 0', [('M', [0, 0]),
+		('Q', [10, 10, 20, 0]), ('Q', [30, -10, 40, 0]),
+		('Q', [50, 10, 60, 0])])
+	_check('M0 0C1 1 2 1 3 0T6 0', [('M', [0, 0]),
+		('C', [1, 1, 2, 1, 3, 0]), ('Q', [3, 0, 6, 0])])
+	_check('M0 0Q1 1 2 0S4 1 5 0', [('M', [0, 0]),
+		('Q', [1, 1, 2, 0]), ('C', [2, 0, 4, 1, 5, 0])])
+	_check('M0 0C1 1 2 1 3 0S5 -1 6 0', [('M', [0, 0]),
+		('C', [1, 1, 2, 1, 3, 0]), ('C', [4, -1, 5, -1, 6, 0])])
+	_check('M0 0L10 0T20 0', [('M', [0, 0]), ('L', [10, 0]),
+		('Q', [10, 0, 20, 0])])
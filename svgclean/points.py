@@ -16,6 +16,7 @@
 #
 import re
 from . import format
+from . import curve
 
 SPLIT_RE = re.compile('[ \t\n,]+')
 
@@ -29,10 +30,75 @@ def transform_values(values, mtx):
 		v.append(y)
 	return v
 
-def split_tokens(pts, options, mtx):
+def _pairs(values):
+	return list(zip(values[::2], values[1::2]))
+
+def _farthest(xy, i, j):
+	'Find the vertex between i and j farthest from the line between them'
+	a = xy[i]
+	b = xy[j]
+	dmax = -1.0
+	k = None
+	for m in range(i + 1, j):
+		d = curve.segment_distance(xy[m], a, b)
+		if d > dmax:
+			dmax = d
+			k = m
+	return k, dmax
+
+def _keep_chain(xy, i, j, tolerance, keep):
+	stack = [(i, j)]
+	while stack:
+		i, j = stack.pop()
+		k, d = _farthest(xy, i, j)
+		if k is not None and d > tolerance:
+			keep[k] = True
+			stack.append((i, k))
+			stack.append((k, j))
+
+def decimate(values, tolerance, closed):
+	'''Remove vertices which are within a tolerance of the simplified line
+	(Douglas-Peucker).  No removed vertex is further than the tolerance
+	from the result.'''
+	xy = [(float(x), float(y)) for x, y in _pairs(values)]
+	n = len(xy)
+	minimum = 3 if closed else 2
+	if n <= minimum:
+		return values
+	keep = [False] * n
+	keep[0] = True
+	if closed:
+		# Split the ring at the vertex farthest from the first
+		x0, y0 = xy[0]
+		f = max(range(1, n), key=lambda m: (xy[m][0] - x0) ** 2 +
+			(xy[m][1] - y0) ** 2)
+		keep[f] = True
+		ring = xy + [xy[0]]
+		keep.append(True)
+		_keep_chain(ring, 0, f, tolerance, keep)
+		_keep_chain(ring, f, n, tolerance, keep)
+		if keep.count(True) < 4:
+			# Keep the vertex farthest from the line
+			k, d = _farthest(ring, 0, f)
+			if k is None:
+				k, d = _farthest(ring, f, n)
+			keep[k] = True
+		del keep[n]
+	else:
+		keep[n - 1] = True
+		_keep_chain(xy, 0, n - 1, tolerance, keep)
+	v = []
+	for i in range(n):
+		if keep[i]:
+			v.extend(xy[i])
+	return v
+
+def split_tokens(pts, options, mtx, closed=False):
 	values = [v for v in SPLIT_RE.split(pts.strip())]
 	if len(values) % 2:
 		del values[-1]
+	if options.tolerance:
+		values = decimate(values, options.tolerance, closed)
 	if options.transform:
 		values = transform_values(values, mtx)
 	first = True
@@ -43,14 +109,16 @@ def split_tokens(pts, options, mtx):
 		else:
 			yield ' ' + format.from_number(v, options.digits)
 
-def convert_to_path(pts, z):
+def convert_to_path(pts, z, tolerance=None):
 	values = [v for v in SPLIT_RE.split(pts.strip())]
 	if len(values) % 2:
 		del values[-1]
+	if tolerance:
+		values = decimate(values, tolerance, z)
 	crds = []
-	while values:
-		x = values.pop(0)
-		y = values.pop(0)
+	for x, y in _pairs(values):
+		x = format.from_number(x, None)
+		y = format.from_number(y, None)
 		if crds:
 			crds.append('L' + x + ' ' + y)
 		else:
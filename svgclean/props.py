@@ -0,0 +1,138 @@
+#
+#   svgclean/props.py
+#
+#   This is a module to declare SVG style properties.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from . import color
+from . import opacity
+from . import stroke
+
+class Property(object):
+	'''Declaration of one style property.  The validator raises ValueError
+	for an invalid value, the normalizer returns the normal form of a valid
+	value, and the compressor checks whether the property has no effect on
+	a style.'''
+
+	def __init__(self, name, inherited, initial, validate, normalize,
+		compress):
+		self.name = name
+		self.inherited = inherited
+		self.initial = initial
+		self.validate = validate
+		self.normalize = normalize
+		self.compress = compress
+
+# All style properties, by name
+REGISTRY = {}
+
+def _register(name, inherited, initial, validate=None, normalize=None,
+	compress=None):
+	REGISTRY[name] = Property(name, inherited, initial, validate,
+		normalize, compress)
+
+# Keywords which are valid for any property
+_CSS_WIDE = ('initial', 'unset', 'revert')
+
+def _keywords(*words):
+	'''Make a validator for a closed set of keywords.  Properties which
+	later specifications extend with new keywords are not validated.'''
+	def validate(value):
+		if value not in words and value not in _CSS_WIDE:
+			raise ValueError(value)
+	return validate
+
+# Initial values which depend on the user agent are None.  Overflow is
+# hidden on some elements by the user agent stylesheet.
+_register('visibility', True, 'visible',
+	_keywords('visible', 'hidden', 'collapse'))
+_register('display', False, 'inline')
+_register('color', True, None, color.validate, color.normalize)
+_register('cursor', True, 'auto')
+_register('pointer-events', True, 'visiblePainted')
+_register('font-family', True, None)
+_register('font-size', True, 'medium')
+_register('font-size-adjust', True, 'none')
+_register('font-stretch', True, 'normal')
+_register('font-style', True, 'normal')
+_register('font-variant', True, 'normal')
+_register('font-weight', True, 'normal')
+_register('text-anchor', True, 'start', _keywords('start', 'middle', 'end'))
+_register('writing-mode', True, 'lr-tb')
+_register('direction', True, 'ltr', _keywords('ltr', 'rtl'))
+_register('unicode-bidi', False, 'normal')
+_register('dominant-baseline', False, 'auto')
+_register('alignment-baseline', False, 'auto')
+_register('baseline-shift', False, 'baseline')
+_register('glyph-orientation-horizontal', True, '0deg')
+_register('glyph-orientation-vertical', True, 'auto')
+_register('kerning', True, 'auto')
+_register('letter-spacing', True, 'normal')
+_register('word-spacing', True, 'normal')
+_register('text-decoration', False, 'none')
+_register('fill', True, 'black', color.validate, color.normalize)
+_register('fill-opacity', True, '1', opacity.validate, opacity.normalize)
+_register('fill-rule', True, 'nonzero', _keywords('nonzero', 'evenodd'))
+_register('stroke', True, 'none', color.validate, color.normalize)
+_register('stroke-dasharray', True, 'none', stroke.validate_dasharray,
+	stroke.normalize_dasharray, stroke.is_unstroked)
+_register('stroke-dashoffset', True, '0', stroke.validate_length, None,
+	stroke.is_undashed)
+_register('stroke-linecap', True, 'butt', stroke.validate_linecap, None,
+	stroke.is_unstroked)
+_register('stroke-linejoin', True, 'miter', stroke.validate_linejoin, None,
+	stroke.is_unstroked)
+_register('stroke-miterlimit', True, '4', stroke.validate_miterlimit,
+	stroke.normalize_number, stroke.is_unmitered)
+_register('stroke-opacity', True, '1', opacity.validate, opacity.normalize,
+	stroke.is_unstroked)
+_register('stroke-width', True, '1', stroke.validate_length,
+	stroke.normalize_length, stroke.is_unstroked)
+_register('clip', False, 'auto')
+_register('clip-path', False, 'none')
+_register('clip-rule', True, 'nonzero', _keywords('nonzero', 'evenodd'))
+_register('mask', False, 'none')
+_register('opacity', False, '1', opacity.validate, opacity.normalize)
+_register('enable-background', False, 'accumulate')
+_register('filter', False, 'none')
+_register('flood-color', False, 'black', color.validate, color.normalize)
+_register('flood-opacity', False, '1', opacity.validate, opacity.normalize)
+_register('lighting-color', False, 'white', color.validate, color.normalize)
+_register('overflow', False, None)
+_register('marker', True, 'none')
+_register('marker-start', True, 'none')
+_register('marker-mid', True, 'none')
+_register('marker-end', True, 'none')
+_register('stop-color', False, 'black', color.validate, color.normalize)
+_register('stop-opacity', False, '1', opacity.validate, opacity.normalize)
+_register('color-interpolation', True, 'sRGB',
+	_keywords('auto', 'sRGB', 'linearRGB'))
+_register('color-interpolation-filters', True, 'linearRGB',
+	_keywords('auto', 'sRGB', 'linearRGB'))
+_register('color-profile', True, 'auto')
+_register('color-rendering', True, 'auto',
+	_keywords('auto', 'optimizeSpeed', 'optimizeQuality'))
+_register('image-rendering', True, 'auto')
+_register('shape-rendering', True, 'auto',
+	_keywords('auto', 'optimizeSpeed', 'crispEdges', 'geometricPrecision'))
+_register('text-rendering', True, 'auto',
+	_keywords('auto', 'optimizeSpeed', 'optimizeLegibility',
+	'geometricPrecision'))
+
+# Names of all style properties, in output order
+NAMES = tuple(REGISTRY)
+
+def initial_values():
+	'Get a map of the initial values of all properties'
+	return dict((p.name, p.initial) for p in REGISTRY.values()
+		if p.initial is not None)
@@ -0,0 +1,183 @@
+#
+#   svgclean/refs.py
+#
+#   This is a module to find references to element ids.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from xml.parsers.expat import ParserCreate, ExpatError
+import re
+
+_URL = re.compile(r'''url\(\s*['"]?#([^)'"\s]+)''')
+_SELECTOR = re.compile(r'#([A-Za-z_][\w-]*)')
+_VALUE = re.compile(r'(?:^|;)\s*#([^;\s]+)')
+_TIMING = re.compile(r'([A-Za-z_][\w-]*)\.')
+
+# Attributes which refer to animation timing of other elements
+_TIMING_ATTRS = ('begin', 'end')
+
+# Elements which may refer to any id
+OPAQUE = ('script',)
+
+# Elements which can only be referred to by id.  Other elements (such as
+# fonts and color profiles) may be referred to by name.
+BY_ID = ('linearGradient', 'radialGradient', 'pattern', 'clipPath', 'mask',
+	'marker', 'filter', 'symbol', 'g', 'path', 'rect', 'circle', 'ellipse',
+	'line', 'polyline', 'polygon', 'text', 'use', 'image')
+
+def attr_refs(name, value):
+	'Get the ids referred to by an attribute'
+	local = name.split(':')[-1]
+	if local == 'href':
+		if value.startswith('#'):
+			yield value[1:]
+	elif local in _TIMING_ATTRS:
+		for m in _TIMING.finditer(value):
+			yield m.group(1)
+	elif local == 'values':
+		for m in _VALUE.finditer(value):
+			yield m.group(1)
+	if 'url(' in value:
+		for m in _URL.finditer(value):
+			yield m.group(1)
+
+def text_refs(text):
+	'Get the ids referred to by stylesheet text'
+	for m in _SELECTOR.finditer(text):
+		yield m.group(1)
+
+# Elements which animate their parent (or the element they refer to)
+ANIMATIONS = ('animate', 'animateColor', 'animateMotion', 'animateTransform',
+	'set')
+
+class AnimationIndex(object):
+	'''Index of animated elements, which have animation children or are
+	referred to by an animation.  Elements are identified by their byte
+	index in the document.'''
+
+	def __init__(self):
+		self.animated = set()
+		self.stack = []
+		self.ids = {}
+		self.targets = set()
+
+	def start_element(self, name, attrs):
+		index = self.parser.CurrentByteIndex
+		ident = attrs.get('id')
+		if ident is not None:
+			self.ids[ident] = index
+		if name.split(':')[-1] in ANIMATIONS:
+			targets = set()
+			for a in attrs:
+				if a.split(':')[-1] == 'href':
+					targets.update(attr_refs(a, attrs[a]))
+			if targets:
+				self.targets |= targets
+			elif self.stack:
+				self.animated.add(self.stack[-1])
+		self.stack.append(index)
+
+	def end_element(self, name):
+		self.stack.pop()
+
+	def scan_file(self, f):
+		self.parser = ParserCreate()
+		self.parser.StartElementHandler = self.start_element
+		self.parser.EndElementHandler = self.end_element
+		try:
+			self.parser.ParseFile(f)
+		except ExpatError:
+			pass
+		self.parser = None
+		for ident in self.targets:
+			if ident in self.ids:
+				self.animated.add(self.ids[ident])
+		self.ids = {}
+		self.targets = set()
+
+	def is_animated(self, index):
+		'Check if an element is animated, by byte index'
+		return index in self.animated
+
+class ReferenceIndex(object):
+	'''Index of id references in a document, built by a streaming scan.
+	Children of defs elements which can only be referred to by id, and
+	contain no referenced ids, are unused.  They are identified by their
+	byte index.  Memory is proportional to
+	the number of ids, not the document size.'''
+
+	def __init__(self):
+		self.ids = set()
+		self.opaque = False
+		self.unused = set()
+		self.defs = []
+		self.depth = 0
+		self.defs_depth = None
+		self.child = None
+		self.child_depth = None
+		self.sheet = None
+
+	def start_element(self, name, attrs):
+		local = name.split(':')[-1]
+		self.depth += 1
+		if local in OPAQUE:
+			self.opaque = True
+		for a in attrs:
+			self.ids.update(attr_refs(a, attrs[a]))
+		ident = attrs.get('id')
+		if self.child is not None:
+			if ident is not None:
+				self.child.add(ident)
+		elif self.defs_depth is not None and \
+		     self.depth == self.defs_depth + 1 and \
+		     local in BY_ID:
+			self.child = set()
+			self.child_depth = self.depth
+			if ident is not None:
+				self.child.add(ident)
+			self.defs.append((self.parser.CurrentByteIndex,
+				self.child))
+		if local == 'defs' and self.defs_depth is None:
+			self.defs_depth = self.depth
+		elif local == 'style':
+			self.sheet = []
+
+	def end_element(self, name):
+		if self.sheet is not None:
+			self.ids.update(text_refs(''.join(self.sheet)))
+			self.sheet = None
+		if self.depth == self.child_depth:
+			self.child = None
+			self.child_depth = None
+		if self.depth == self.defs_depth:
+			self.defs_depth = None
+		self.depth -= 1
+
+	def character_data(self, data):
+		if self.sheet is not None:
+			self.sheet.append(data)
+
+	def scan_file(self, f):
+		self.parser = ParserCreate()
+		self.parser.StartElementHandler = self.start_element
+		self.parser.EndElementHandler = self.end_element
+		self.parser.CharacterDataHandler = self.character_data
+		try:
+			self.parser.ParseFile(f)
+		except ExpatError:
+			pass
+		self.parser = None
+		if not self.opaque:
+			for index, ids in self.defs:
+				if not ids & self.ids:
+					self.unused.add(index)
+		self.defs = []
@@ -0,0 +1,151 @@
+#
+#   svgclean/reuse.py
+#
+#   This is a module to replace duplicated paths with use elements.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from xml.parsers.expat import ParserCreate, ExpatError
+from . import format
+from . import path
+from . import props
+
+# Approximate extra length of a use element, compared to a path element
+_USE_COST = 28
+
+# Approximate length of a path definition, not counting its path data
+_DEF_COST = 24
+
+# Attributes which can be moved from a path onto a use element
+_MOVABLE = ('d', 'style', 'transform') + props.NAMES
+
+def _number(v, digits):
+	s = format.from_number(v, digits)
+	if s == '-0':
+		return '0'
+	else:
+		return s
+
+def _move_pair(pts, start, i):
+	return [pts[i] - start[0], pts[i + 1] - start[1]]
+
+def _move_values(letter, pts, start):
+	if letter == 'H':
+		return [pts[0] - start[0]]
+	elif letter == 'V':
+		return [pts[0] - start[1]]
+	elif letter == 'A':
+		return pts[:5] + _move_pair(pts, start, 5)
+	else:
+		values = []
+		for i in range(0, len(pts), 2):
+			values.extend(_move_pair(pts, start, i))
+		return values
+
+def normalize(geometry, digits):
+	'Normalize path geometry relative to its starting point'
+	start = None
+	cmnds = []
+	for letter, pts in path.split_values(geometry):
+		if start is None:
+			if letter != 'M':
+				raise path.InvalidPathError(geometry)
+			start = (pts[0], pts[1])
+		values = _move_values(letter, pts, start)
+		cmnds.append(letter + ' '.join(_number(v, digits)
+			for v in values))
+	if start is None:
+		raise path.InvalidPathError(geometry)
+	return start, ''.join(cmnds)
+
+def _is_candidate(name, attrs):
+	if name != 'path' or 'd' not in attrs:
+		return False
+	for a in attrs:
+		if a not in _MOVABLE:
+			return False
+	return True
+
+class PathIndex(object):
+	'Index of path geometry which is repeated within a document'
+
+	def __init__(self, digits):
+		self.digits = digits
+		self.ids = set()
+		self.counts = {}
+		self.defs = {}
+		self.idents = set()
+
+	def start_element(self, name, attrs):
+		if 'id' in attrs:
+			self.ids.add(attrs['id'])
+		if _is_candidate(name, attrs):
+			try:
+				start, key = normalize(attrs['d'], self.digits)
+			except path.InvalidPathError:
+				return
+			self.counts[key] = self.counts.get(key, 0) + 1
+
+	def scan_file(self, f):
+		parser = ParserCreate()
+		parser.StartElementHandler = self.start_element
+		try:
+			parser.ParseFile(f)
+		except ExpatError:
+			pass
+		self._assign_ids()
+		self.counts = {}
+
+	def _next_id(self, n):
+		while True:
+			ident = 'p%d' % n
+			n += 1
+			if ident not in self.ids:
+				return ident, n
+
+	def _assign_ids(self):
+		n = 0
+		for key in sorted(self.counts):
+			count = self.counts[key]
+			saved = len(key) * (count - 1) - _USE_COST * count
+			if count > 1 and saved > _DEF_COST:
+				ident, n = self._next_id(n)
+				self.defs[key] = ident
+				self.idents.add(ident)
+				self.ids.add(ident)
+
+	def is_defined(self, ident):
+		return ident in self.idents
+
+	def definitions(self):
+		'Get a list of (id, path data) for all definitions'
+		return sorted((self.defs[key], key) for key in self.defs)
+
+	def replace_path(self, name, attrs):
+		'Replace a path element with a use element, if possible'
+		if not (self.defs and _is_candidate(name, attrs)):
+			return name
+		try:
+			start, key = normalize(attrs['d'], self.digits)
+		except path.InvalidPathError:
+			return name
+		if key not in self.defs:
+			return name
+		del attrs['d']
+		attrs['xlink:href'] = '#' + self.defs[key]
+		x = _number(start[0], self.digits)
+		y = _number(start[1], self.digits)
+		if x != '0':
+			attrs['x'] = x
+		if y != '0':
+			attrs['y'] = y
+		return 'use'
@@ -0,0 +1,285 @@
+#
+#   svgclean/shape.py
+#
+#   This is a module to convert between basic shapes and paths.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+import re
+from . import format
+from . import path
+
+# Geometry attributes of each basic shape
+ATTRIBS = {
+	'line': ('x1', 'y1', 'x2', 'y2'),
+	'rect': ('x', 'y', 'width', 'height', 'rx', 'ry'),
+	'circle': ('cx', 'cy', 'r'),
+	'ellipse': ('cx', 'cy', 'rx', 'ry'),
+}
+
+# Styles which render differently on paths than on closed shapes
+_PATH_STYLES = ('marker', 'marker-start', 'marker-mid', 'marker-end',
+	'stroke-dasharray')
+
+_NUMBER = re.compile(
+	r'^\s*([+-]?(\d+\.\d*|\d*\.\d+|\d+)([eE][+-]?\d+)?)(px)?\s*$')
+
+def _number(attrs, name, default=None):
+	value = attrs.get(name, default)
+	if value is None:
+		raise ValueError(name)
+	m = _NUMBER.match(value)
+	if not m:
+		raise ValueError(value)
+	return float(m.group(1))
+
+def _path_styled(style):
+	for p in _PATH_STYLES:
+		if style.get_prop(p) not in (None, 'none'):
+			return True
+	return False
+
+def _join(cmnds):
+	return ''.join(letter + ' '.join(format.from_number(v, None)
+		for v in values) for letter, values in cmnds)
+
+def _rect_radii(attrs, width, height):
+	if 'rx' in attrs or 'ry' in attrs:
+		rx = _number(attrs, 'rx', attrs.get('ry'))
+		ry = _number(attrs, 'ry', attrs.get('rx'))
+		return min(rx, width / 2.0), min(ry, height / 2.0)
+	return 0.0, 0.0
+
+def rect_path(attrs):
+	'Get path data for a rect element'
+	x = _number(attrs, 'x', '0')
+	y = _number(attrs, 'y', '0')
+	w = _number(attrs, 'width')
+	h = _number(attrs, 'height')
+	if w <= 0 or h <= 0:
+		raise ValueError('empty rect')
+	rx, ry = _rect_radii(attrs, w, h)
+	if rx <= 0 or ry <= 0:
+		return _join((('M', (x, y)), ('H', (x + w,)),
+			('V', (y + h,)), ('H', (x,)), ('Z', ())))
+	r = x + w
+	b = y + h
+	return _join((
+		('M', (x + rx, y)),
+		('H', (r - rx,)),
+		('A', (rx, ry, 0, 0, 1, r, y + ry)),
+		('V', (b - ry,)),
+		('A', (rx, ry, 0, 0, 1, r - rx, b)),
+		('H', (x + rx,)),
+		('A', (rx, ry, 0, 0, 1, x, b - ry)),
+		('V', (y + ry,)),
+		('A', (rx, ry, 0, 0, 1, x + rx, y)),
+		('Z', ()),
+	))
+
+def ellipse_path(cx, cy, rx, ry):
+	'Get path data for an ellipse'
+	if rx <= 0 or ry <= 0:
+		raise ValueError('empty ellipse')
+	return _join((
+		('M', (cx + rx, cy)),
+		('A', (rx, ry, 0, 1, 1, cx - rx, cy)),
+		('A', (rx, ry, 0, 1, 1, cx + rx, cy)),
+		('Z', ()),
+	))
+
+def shape_path(name, attrs, style):
+	'Get path data for a basic shape, or None if it cannot be converted'
+	try:
+		if name == 'line':
+			return _join((('M', (_number(attrs, 'x1', '0'),
+				_number(attrs, 'y1', '0'))),
+				('L', (_number(attrs, 'x2', '0'),
+				_number(attrs, 'y2', '0')))))
+		if _path_styled(style):
+			return None
+		if name == 'rect':
+			return rect_path(attrs)
+		elif name == 'circle':
+			r = _number(attrs, 'r')
+			return ellipse_path(_number(attrs, 'cx', '0'),
+				_number(attrs, 'cy', '0'), r, r)
+		elif name == 'ellipse':
+			return ellipse_path(_number(attrs, 'cx', '0'),
+				_number(attrs, 'cy', '0'), _number(attrs, 'rx'),
+				_number(attrs, 'ry'))
+	except ValueError:
+		return None
+
+def _line_point(pen, letter, pts):
+	if letter == 'L':
+		return (pts[0], pts[1])
+	elif letter == 'H':
+		return (pts[0], pen[1])
+	elif letter == 'V':
+		return (pen[0], pts[0])
+
+def _path_line(cmnds):
+	if len(cmnds) == 2:
+		p1 = _line_point(cmnds[0][1], cmnds[1][0], cmnds[1][1])
+		if p1:
+			x1, y1 = cmnds[0][1]
+			return ('line', (('x1', x1), ('y1', y1), ('x2', p1[0]),
+				('y2', p1[1])))
+
+def _path_rect(cmnds):
+	if cmnds[-1][0] != 'Z' or len(cmnds) not in (5, 6):
+		return None
+	pts = [cmnds[0][1]]
+	for letter, values in cmnds[1:-1]:
+		p = _line_point(pts[-1], letter, values)
+		if p is None:
+			return None
+		pts.append(p)
+	if len(pts) == 5:
+		if pts[-1] != pts[0]:
+			return None
+		pts.pop()
+	pts.append(pts[0])
+	horiz = pts[0][1] == pts[1][1]
+	for i in range(4):
+		p0 = pts[i]
+		p1 = pts[i + 1]
+		if horiz != (i % 2 == 0):
+			if p0[1] != p1[1] or p0[0] == p1[0]:
+				return None
+		elif p0[0] != p1[0] or p0[1] == p1[1]:
+			return None
+	xs = [p[0] for p in pts]
+	ys = [p[1] for p in pts]
+	x = min(xs)
+	y = min(ys)
+	return ('rect', (('x', x), ('y', y), ('width', max(xs) - x),
+		('height', max(ys) - y)))
+
+def _path_ellipse(cmnds):
+	if cmnds[-1][0] == 'Z':
+		cmnds = cmnds[:-1]
+	if len(cmnds) != 3 or cmnds[1][0] != 'A' or cmnds[2][0] != 'A':
+		return None
+	x0, y0 = cmnds[0][1]
+	rx, ry, rot, large, sweep, x1, y1 = cmnds[1][1]
+	a = cmnds[2][1]
+	if a[:3] != [rx, ry, rot] or a[4] != sweep or a[5:] != [x0, y0]:
+		return None
+	if rot != 0 or rx <= 0 or ry <= 0:
+		return None
+	if y0 == y1 and abs(x1 - x0) == 2 * rx:
+		cx = (x0 + x1) / 2.0
+		cy = y0
+	elif x0 == x1 and abs(y1 - y0) == 2 * ry:
+		cx = x0
+		cy = (y0 + y1) / 2.0
+	else:
+		return None
+	if rx == ry:
+		return ('circle', (('cx', cx), ('cy', cy), ('r', rx)))
+	else:
+		return ('ellipse', (('cx', cx), ('cy', cy), ('rx', rx),
+			('ry', ry)))
+
+def path_shape(geometry, style, digits):
+	'''Get a basic shape which is exactly equivalent to path data, as
+	(name, attrs), or None'''
+	try:
+		cmnds = list(path.split_values(geometry))
+	except path.InvalidPathError:
+		return None
+	if len(cmnds) < 2 or cmnds[0][0] != 'M':
+		return None
+	shape = _path_line(cmnds)
+	if shape is None and not _path_styled(style):
+		shape = _path_rect(cmnds) or _path_ellipse(cmnds)
+	if shape is None:
+		return None
+	name, values = shape
+	attrs = {}
+	for a, v in values:
+		v = format.from_number(v, digits)
+		if v == '-0':
+			v = '0'
+		if v != '0' or a not in ('x', 'y', 'cx', 'cy'):
+			attrs[a] = v
+	return name, attrs
+
+def _transform_points(values, m):
+	pts = []
+	for i in range(0, len(values) - 1, 2):
+		x = values[i]
+		y = values[i + 1]
+		pts.append(m[0] * x + m[2] * y + m[4])
+		pts.append(m[1] * x + m[3] * y + m[5])
+	return pts
+
+def _set_numbers(attrs, names, values):
+	for a, v in zip(names, values):
+		attrs[a] = format.from_number(v, None)
+
+def transform(name, attrs, mtx):
+	'''Apply a matrix to the geometry attributes of a shape.  Rects and
+	ellipses require an axis-aligned matrix; circles also require a
+	uniform scale.'''
+	m = mtx.m
+	if name == 'path':
+		attrs['d'] = path.transform(attrs['d'], mtx)
+	elif name in ('polygon', 'polyline'):
+		values = [float(v[0]) for v in
+			path.SPLIT_RE.findall(attrs['points'])]
+		pts = _transform_points(values, m)
+		attrs['points'] = ' '.join(format.from_number(v, None)
+			for v in pts)
+	elif name == 'line':
+		names = ATTRIBS[name]
+		values = [_number(attrs, a, '0') for a in names]
+		_set_numbers(attrs, names, _transform_points(values, m))
+	elif name == 'rect':
+		x = _number(attrs, 'x', '0')
+		y = _number(attrs, 'y', '0')
+		w = _number(attrs, 'width') * abs(m[0])
+		h = _number(attrs, 'height') * abs(m[3])
+		x, y = _transform_points((x, y), m)
+		if m[0] < 0:
+			x -= w
+		if m[3] < 0:
+			y -= h
+		_set_numbers(attrs, ('x', 'y', 'width', 'height'),
+			(x, y, w, h))
+		if 'rx' in attrs or 'ry' in attrs:
+			rx = _number(attrs, 'rx', attrs.get('ry'))
+			ry = _number(attrs, 'ry', attrs.get('rx'))
+			rx *= abs(m[0])
+			ry *= abs(m[3])
+			if rx == ry:
+				attrs.pop('rx', None)
+				attrs.pop('ry', None)
+				_set_numbers(attrs, ('rx',), (rx,))
+			else:
+				_set_numbers(attrs, ('rx', 'ry'), (rx, ry))
+	elif name in ('circle', 'ellipse'):
+		cx = _number(attrs, 'cx', '0')
+		cy = _number(attrs, 'cy', '0')
+		_set_numbers(attrs, ('cx', 'cy'),
+			_transform_points((cx, cy), m))
+		if name == 'circle':
+			_set_numbers(attrs, ('r',),
+				(_number(attrs, 'r') * abs(m[0]),))
+		else:
+			_set_numbers(attrs, ('rx', 'ry'),
+				(_number(attrs, 'rx') * abs(m[0]),
+				_number(attrs, 'ry') * abs(m[3])))
+	else:
+		raise ValueError(name)
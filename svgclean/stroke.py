@@ -17,16 +17,6 @@
 import re
 from . import format
 
-STYLES = (
-	'stroke-dasharray',
-	'stroke-dashoffset',
-	'stroke-linecap',
-	'stroke-linejoin',
-	'stroke-miterlimit',
-	'stroke-opacity',
-	'stroke-width',
-)
-
 _DASHARRAY = re.compile(
 	'((\d+\.\d*)|(\d*\.\d+)|(\d+))(\s*(em|ex|px|pt|pc|cm|mm|in|\%))?\s*,?\s*')
 
@@ -47,7 +37,10 @@ def validate_linecap(value):
 	if value not in _LINECAPS:
 		raise ValueError(value)
 
-_LINEJOINS = ('miter', 'round', 'bevel')
+_LINEJOINS = ('miter', 'round', 'bevel', 'miter-clip', 'arcs')
+
+# Line joins which use the miter limit
+_MITERED = ('miter', 'miter-clip', 'arcs')
 
 def validate_linejoin(value):
 	if value not in _LINEJOINS:
@@ -62,19 +55,6 @@ def validate_miterlimit(value):
 	if l < 1:
 		raise ValueError(value)
 
-_VALIDATE = {
-	'stroke-dasharray': validate_dasharray,
-	'stroke-dashoffset': validate_length,
-	'stroke-linecap': validate_linecap,
-	'stroke-linejoin': validate_linejoin,
-	'stroke-miterlimit': validate_miterlimit,
-	'stroke-width': validate_length,
-}
-
-def validate(name, value):
-	if name in _VALIDATE:
-		_VALIDATE[name](value)
-
 def normalize_length(value):
 	m = _LENGTH.match(value)
 	v = format.from_number(m.group(1), 3)
@@ -92,23 +72,16 @@ def normalize_dasharray(value):
 def normalize_number(value):
 	return format.from_number(value, 3)
 
-_NORMALIZE = {
-	'stroke-dasharray': normalize_dasharray,
-	'stroke-width': normalize_length,
-	'stroke-miterlimit': normalize_number,
-}
+def is_unstroked(style):
+	'Check if a style has no stroke'
+	return style.get_prop('stroke') == 'none'
 
-def normalize(name, value):
-	if name in _NORMALIZE:
-		return _NORMALIZE[name](value)
-	else:
-		return value
+def is_unmitered(style):
+	'Check if a style has no mitered stroke joins'
+	return is_unstroked(style) or \
+		style.get_prop('stroke-linejoin') not in _MITERED
 
-def compress(style, verbose):
-	if style.get_prop('stroke') == 'none':
-		for s in STYLES:
-			style.del_prop(s, verbose)
-	if style.get_prop('stroke-linejoin') != 'miter':
-		style.del_prop('stroke-miterlimit', verbose)
-	if style.get_prop('stroke-dasharray') == 'none':
-		style.del_prop('stroke-dashoffset', verbose)
+def is_undashed(style):
+	'Check if a style has no dashed stroke'
+	return is_unstroked(style) or \
+		style.get_prop('stroke-dasharray') == 'none'
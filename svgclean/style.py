@@ -17,44 +17,82 @@
 
 import re
 import sys
+from functools import lru_cache
 from . import color
-from . import opacity
-from . import stroke
-
-# FIXME: option to convert all style to embedded CSS with class attributes
-# FIXME: option to convert all style to external CSS with class attributes
+from . import props
 
 _INHERIT = 'inherit'
 
+# Styling mode to choose the shorter of presentation attributes and inline
+# style for each element
+SHORTEST = 'shortest'
+
 class InvalidStyleError(Exception):
 	pass
 
+# Maximum number of (property, value) pairs with cached validation and
+# normalization results.  The caches are shared by all documents.
+VALUE_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=VALUE_CACHE_SIZE)
+def is_valid_prop(name, value):
+	'Check if a style property value is valid'
+	prop = props.REGISTRY.get(name)
+	if prop is None:
+		return True
+	validate = prop.validate
+	if validate:
+		try:
+			validate(value)
+		except ValueError:
+			return False
+	return True
+
+def normalize_prop(name, value):
+	'Normalize the value of one style property'
+	return _normalize_prop(name, value, color.HEX_ALPHA)
+
+@lru_cache(maxsize=VALUE_CACHE_SIZE)
+def _normalize_prop(name, value, hex_alpha):
+	'''Normalize a property value.  Output options which change the
+	result are part of the cache key.'''
+	prop = props.REGISTRY.get(name)
+	if prop is None:
+		return value
+	normalize = prop.normalize
+	if normalize:
+		return normalize(value)
+	else:
+		return value
+
+def cache_report():
+	'Get a report of value cache hit rates'
+	lines = []
+	for label, f in (('Validation', is_valid_prop),
+	                 ('Normalization', _normalize_prop)):
+		info = f.cache_info()
+		total = info.hits + info.misses
+		rate = 100.0 * info.hits / total if total else 0.0
+		lines.append('%s cache: %d hits, %d misses (%.1f%%), %d values'
+			% (label, info.hits, info.misses, rate, info.currsize))
+	return '\n'.join(lines)
+
+def _print_warning(msg):
+	print(msg, file=sys.stderr)
+
 class Style(object):
-	# FIXME: add missing styles
-	ALL = (
-		'visibility', 'display', 'color',
-		'font-family', 'font-size', 'font-stretch', 'font-style',
-		'font-variant', 'font-weight', 'text-anchor', 'writing-mode',
-		'kerning', 'letter-spacing',
-		'fill', 'fill-opacity', 'fill-rule',
-		'stroke', 'stroke-dasharray', 'stroke-dashoffset',
-		'stroke-linecap', 'stroke-linejoin', 'stroke-miterlimit',
-		'stroke-opacity', 'stroke-width',
-		'clip-path', 'clip-rule', 'mask', 'opacity',
-		'enable-background', 'filter',
-		'overflow',
-		'marker', 'marker-start', 'marker-mid', 'marker-end',
-		'stop-color', 'stop-opacity',
-	)
-
-	def __init__(self, parent, attrs):
+
+	def __init__(self, parent, attrs, rules=False, warn=None):
 		self.parent = parent
+		self.rules = rules
+		self.warn = warn or _print_warning
 		self._props = {}
+		self._computed = None
 		self._set_presentation_attrs(attrs)
 		self._parse_style_attr(attrs)
 
 	def _set_presentation_attrs(self, attrs):
-		for name in Style.ALL:
+		for name in props.NAMES:
 			if name in attrs:
 				value = attrs[name].strip().strip(';')
 				self.set_prop(name, value)
@@ -64,8 +102,7 @@ class Style(object):
 		try:
 			name, value = s.split(':')
 		except ValueError:
-			print('Discarding invalid style: %s' % s,
-			      file=sys.stderr)
+			self.warn('Discarding invalid style: %s' % s)
 			return
 		name = name.strip()
 		value = value.strip()
@@ -80,33 +117,66 @@ class Style(object):
 			del attrs['style']
 
 	def _set_prop(self, name, value):
-		if value is _INHERIT:
-			pass
-		elif name in color.STYLES:
-			color.validate(value)
-		elif name in opacity.STYLES:
-			opacity.validate(value)
-		elif name in stroke.STYLES:
-			stroke.validate(name, value)
+		if value != _INHERIT and not is_valid_prop(name, value):
+			raise ValueError(value)
 		self._props[name] = value
 
 	def set_prop(self, name, value):
-		if name not in Style.ALL:
-			print(('Discarding unknown style: %s:%s' %
-			      (name, value)), file=sys.stderr)
+		if name not in props.REGISTRY:
+			self.warn('Discarding unknown style: %s:%s' %
+				(name, value))
 			return
 		try:
 			self._set_prop(name, value)
+			self._computed = None
 		except ValueError:
-			print(('Invalid style value: %s:%s' % (name, value)),
-			      file=sys.stderr)
+			self.warn('Invalid style value: %s:%s' % (name, value))
+
+	def _computed_props(self):
+		"""Get a map of all computed properties.  The map is shared
+		with the parent when this style declares no properties, so
+		styles must not be changed after their children are used."""
+		c = self._computed
+		if c is None:
+			if self.parent is None:
+				c = dict(self._props)
+			else:
+				c = self.parent._computed_props()
+				if self._props:
+					c = dict(c)
+					c.update(self._props)
+			self._computed = c
+		return c
 
 	def get_prop(self, name):
-		try:
-			return self._props[name]
-		except KeyError:
-			if self.parent:
-				return self.parent.get_prop(name)
+		prop = props.REGISTRY.get(name)
+		if prop is None or prop.inherited:
+			return self._computed_props().get(name)
+		return self._cascaded(name, prop)
+
+	def _cascaded(self, name, prop):
+		'''Get a non-inherited property, declared by this style or its
+		style rules (a parent with rules), or else the initial value'''
+		s = self
+		while True:
+			value = s._props.get(name)
+			if value is not None:
+				return value
+			if s.parent is None or not s.parent.rules:
+				return prop.initial
+			s = s.parent
+
+	def declared_props(self):
+		'Get the declared (property, value) pairs'
+		return tuple(self._props.items())
+
+	def replace_props(self, names, func):
+		'Replace the values of declared properties'
+		for name in names:
+			value = self._props.get(name)
+			if value is not None:
+				self._props[name] = func(value)
+		self._computed = None
 
 	def del_prop(self, name, verbose):
 		try:
@@ -115,41 +185,39 @@ class Style(object):
 				print('Removing style: %s:%s' % (name, value),
 				      file=sys.stderr)
 			del self._props[name]
+			self._computed = None
 		except KeyError:
 			pass
 
 	def normalize(self):
 		for name in self._props:
 			value = self._props[name]
-			if value is _INHERIT:
-				continue
-			elif name in color.STYLES:
-				v = color.normalize(value)
-			elif name in opacity.STYLES:
-				v = opacity.normalize(value)
-			elif name in stroke.STYLES:
-				v = stroke.normalize(name, value)
-			else:
-				continue
-			self._props[name] = v
+			if value != _INHERIT:
+				self._props[name] = normalize_prop(name, value)
+		self._computed = None
 
 	def compress(self, verbose):
-		stroke.compress(self, verbose)
-		for name in Style.ALL:
+		for name in props.NAMES:
 			if name in self._props:
 				value = self._props[name]
-				par = self.parent.get_prop(name)
-				if opacity.compress(name, value):
+				prop = props.REGISTRY[name]
+				if prop.inherited:
+					ref = self.parent.get_prop(name)
+				elif self.parent.rules:
+					ref = self.parent._cascaded(name, prop)
+				else:
+					ref = prop.initial
+				if prop.compress and prop.compress(self):
 					self.del_prop(name, verbose)
-				elif value == par:
+				elif value == ref:
 					self.del_prop(name, verbose)
 
 	def as_inline(self):
-		props = []
-		for p in Style.ALL:
+		decls = []
+		for p in props.NAMES:
 			if p in self._props:
-				props.append(':'.join((p, self._props[p])))
-		return ';'.join(props)
+				decls.append(':'.join((p, self._props[p])))
+		return ';'.join(decls)
 
 	def set_inline_style(self, attrs):
 		value = self.as_inline()
@@ -160,16 +228,41 @@ class Style(object):
 		for p in self._props:
 			attrs[p] = self._props[p]
 
+	def set_shortest_attributes(self, attrs):
+		'Set presentation attributes or inline style, whichever is shorter'
+		value = self.as_inline()
+		if not value:
+			return
+		size = sum(len(" %s=''" % p) + len(v)
+			for p, v in self._props.items())
+		if size < len(" style=''") + len(value):
+			self.set_presentation_attributes(attrs)
+		else:
+			attrs['style'] = value
+
 	def __str__(self):
-		props = []
-		for p in Style.ALL:
+		decls = []
+		for p in props.NAMES:
 			if p in self._props:
-				props.append(':'.join((p, self._props[p])))
-		if props:
-			return "style='" + ';'.join(props) + "'"
+				decls.append(':'.join((p, self._props[p])))
+		if decls:
+			return "style='" + ';'.join(decls) + "'"
 		else:
 			return ''
 
+# Maximum number of interned styles
+INTERN_SIZE = 4096
+
+def split_input(attrs):
+	'Remove style properties from attributes, returning them as a tuple'
+	raw = []
+	for name in props.NAMES:
+		if name in attrs:
+			raw.append((name, attrs.pop(name)))
+	if 'style' in attrs:
+		raw.append(('style', attrs.pop('style')))
+	return tuple(raw)
+
 FILL_STYLES = {
 	'fill': 'black',
 	'fill-opacity': '1',
@@ -184,25 +277,25 @@ def compress_fill_styles(style):
 		style['fill'] = 'none'
 		return
 
-ROOT = Style(None, {
-	'display': 'inline',
-	'visibility': 'visible',
-	'opacity': '1',
-	'flood-opacity': '1',
-	'stop-opacity': '1',
-	'fill': 'black',
-	'fill-opacity': '1',
-	'fill-rule': 'nonzero',
-	'stroke': 'none',
-	'stroke-dasharray': 'none',
-	'stroke-dashoffset': '0',
-	'stroke-linecap': 'butt',
-	'stroke-linejoin': 'miter',
-	'stroke-miterlimit': '4',
-	'stroke-opacity': '1',
-	'stroke-width': '1',
-	'marker': 'none',
-	'marker-start': 'none',
-	'marker-end': 'none',
-	'marker-mid': 'none',
-})
+ROOT = Style(None, props.initial_values())
+
+def _compress(rules, inline, expected):
+	parent = ROOT
+	if rules:
+		parent = Style(ROOT, dict(rules), True)
+		parent.normalize()
+	s = Style(parent, {'style': inline})
+	s.normalize()
+	s.compress(False)
+	v = s.as_inline()
+	assert v == expected, (rules, inline, v)
+	print('%s\t%s' % (v, inline))
+
+if __name__ == '__main__':
+	_compress((), 'opacity:1', '')
+	_compress((('opacity', '.5'),), 'opacity:1', 'opacity:1')
+	_compress((('opacity', '.5'),), 'opacity:.5', '')
+	_compress((('display', 'none'),), 'display:inline', 'display:inline')
+	_compress((), 'display:inline', '')
+	_compress((('fill', 'red'),), 'fill:black', 'fill:#000')
+	_compress((('fill', 'red'),), 'fill:red', '')
@@ -15,46 +15,59 @@
 #   included COPYING file for more details.
 #
 import re
-from math import sin, cos, radians
+from math import sin, cos, tan, radians
+from . import format
 
 class InvalidTransformError(Exception):
 	pass
 
+def _multiply(o, m):
+	"""
+		| a c e |   | t v x |   | at+bv ct+dv et+fv+x |
+		| b d f | * | u w y | = | au+bw cu+dw eu+fw+y |
+		| 0 0 1 |   | 0 0 1 |   |   0     0      1    |
+	"""
+	return (
+		m[0] * o[0] + m[1] * o[2],
+		m[0] * o[1] + m[1] * o[3],
+		m[2] * o[0] + m[3] * o[2],
+		m[2] * o[1] + m[3] * o[3],
+		m[4] * o[0] + m[5] * o[2] + o[4],
+		m[4] * o[1] + m[5] * o[3] + o[5],
+	)
+
+IDENTITY = (1, 0, 0, 1, 0, 0)
+
 class Matrix(object):
 
-	def __init__(self, m = (1, 0, 0, 1, 0, 0)):
+	def __init__(self, m = IDENTITY):
 		assert isinstance(m, tuple)
 		assert len(m) == 6
 		self.m = m
 
 	def multiply(self, other):
-		"""
-			| a c e |   | t v x |   | at+bv ct+dv et+fv+x |
-			| b d f | * | u w y | = | au+bw cu+dw eu+fw+y |
-			| 0 0 1 |   | 0 0 1 |   |   0     0      1    |
-		"""
-		o = self.m
-		m = other.m
-		self.m = (
-			m[0] * o[0] + m[1] * o[2],
-			m[0] * o[1] + m[1] * o[3],
-			m[2] * o[0] + m[3] * o[2],
-			m[2] * o[1] + m[3] * o[3],
-			m[4] * o[0] + m[5] * o[2] + o[4],
-			m[4] * o[1] + m[5] * o[3] + o[5],
-		)
+		self.m = _multiply(self.m, other.m)
 
 	def translate(self, x, y):
-		self.multiply(Matrix((1, 0, 0, 1, x, y)))
+		self.m = _multiply(self.m, (1, 0, 0, 1, x, y))
 
 	def scale(self, x, y):
-		self.multiply(Matrix((x, 0, 0, y, 0, 0)))
+		self.m = _multiply(self.m, (x, 0, 0, y, 0, 0))
 
 	def rotate(self, d):
 		a = radians(d)
 		s = sin(a)
 		c = cos(a)
-		self.multiply(Matrix((c, s, -s, c, 0, 0)))
+		self.m = _multiply(self.m, (c, s, -s, c, 0, 0))
+
+	def skew_x(self, d):
+		self.m = _multiply(self.m, (1, 0, tan(radians(d)), 1, 0, 0))
+
+	def skew_y(self, d):
+		self.m = _multiply(self.m, (1, tan(radians(d)), 0, 1, 0, 0))
+
+	def is_identity(self):
+		return self.m == IDENTITY
 
 	def transform_point(self, x, y):
 		m = self.m
@@ -63,74 +76,98 @@ class Matrix(object):
 			m[1] * x + m[3] * y + m[5],
 		)
 
-_TRANSFORM = re.compile('(matrix|translate|scale|rotate)(\(.*?\))')
-_NUMBERS = re.compile('([+-]?([0-9]+(\.[0-9]+)?)([eE][+-]?[0-9]+)?)')
+	def __str__(self):
+		return 'matrix(%s)' % ' '.join(format.from_number(v, None)
+			for v in self.m)
+
+_TRANSFORM = re.compile(
+	r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+_NUMBERS = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+
+# Maximum number of parsed transform strings to cache
+_CACHE_SIZE = 1024
+
+# Cache of parsed transform strings
+_cache = {}
 
 def _parse_numbers(v):
-	m = []
-	for ma in _NUMBERS.finditer(v):
-		m.append(float(ma.group(0)))
-	return m
+	return [float(n) for n in _NUMBERS.findall(v)]
 
-def _parse_translate(v):
-	t = _parse_numbers(v)
-	if len(t) != 2:
+def _parse_translate(m, t):
+	if len(t) == 1:
+		m.translate(t[0], 0)
+	elif len(t) == 2:
+		m.translate(*t)
+	else:
 		raise InvalidTransformError
-	x, y = t
-	m = Matrix()
-	m.translate(x, y)
-	return m
 
-def _parse_rotate(v):
-	t = _parse_numbers(v)
-	if len(t) != 1:
+def _parse_rotate(m, t):
+	if len(t) == 1:
+		m.rotate(t[0])
+	elif len(t) == 3:
+		d, x, y = t
+		m.translate(x, y)
+		m.rotate(d)
+		m.translate(-x, -y)
+	else:
 		raise InvalidTransformError
-	d = t[0]
-	m = Matrix()
-	m.rotate(d)
-	return m
 
-def _parse_scale(v):
-	t = _parse_numbers(v)
+def _parse_scale(m, t):
 	if len(t) == 1:
-		s = t[0]
-		m = Matrix()
-		m.scale(s, s)
-		return m
+		m.scale(t[0], t[0])
 	elif len(t) == 2:
-		x, y = t
-		m = Matrix()
-		m.scale(x, y)
-		return m
+		m.scale(*t)
 	else:
 		raise InvalidTransformError
 
-def _parse_matrix(v):
-	m = _parse_numbers(v)
-	if len(m) != 6:
+def _parse_skew(m, t, skew):
+	if len(t) != 1:
 		raise InvalidTransformError
-	return Matrix(tuple(m))
+	skew(t[0])
 
-def _parse(f, v):
+def _parse_matrix(m, t):
+	if len(t) != 6:
+		raise InvalidTransformError
+	m.m = _multiply(m.m, tuple(t))
+
+def _parse(m, f, v):
+	t = _parse_numbers(v)
 	if f == 'translate':
-		return _parse_translate(v)
+		_parse_translate(m, t)
 	elif f == 'rotate':
-		return _parse_rotate(v)
+		_parse_rotate(m, t)
 	elif f == 'scale':
-		return _parse_scale(v)
+		_parse_scale(m, t)
+	elif f == 'skewX':
+		_parse_skew(m, t, m.skew_x)
+	elif f == 'skewY':
+		_parse_skew(m, t, m.skew_y)
 	elif f == 'matrix':
-		return _parse_matrix(v)
+		_parse_matrix(m, t)
 	else:
 		raise InvalidTransformError
 
-def parse(parent, attrs):
-	import sys
-	m = Matrix(parent.m)
-	if 'transform' in attrs:
-		t = attrs['transform']
+def parse_transform(t):
+	'Parse a transform attribute value into a matrix tuple'
+	m = _cache.get(t)
+	if m is None:
+		mtx = Matrix()
 		for ma in _TRANSFORM.finditer(t):
-			f = ma.group(1)
-			v = ma.group(2)
-			m.multiply(_parse(f, v))
-		del attrs['transform']
+			_parse(mtx, ma.group(1), ma.group(2))
+		m = mtx.m
+		if len(_cache) >= _CACHE_SIZE:
+			_cache.clear()
+		_cache[t] = m
 	return m
+
+def parse(parent, attrs):
+	"""Get the matrix of an element.  The parent matrix is returned
+	(not copied) if the element has no transform, so matrices must not
+	be modified after parsing."""
+	t = attrs.get('transform')
+	if t is None:
+		return parent
+	m = parse_transform(t)
+	if m == IDENTITY:
+		return parent
+	return Matrix(_multiply(parent.m, m))
@@ -0,0 +1,290 @@
+#
+#   svgclean/tree.py
+#
+#   This is a module to build a compact document tree for optimizations
+#   which need the whole document.
+#   Copyright (C) 2006-2025  Douglas P. Lau
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   included COPYING file for more details.
+#
+from xml.parsers.expat import ParserCreate
+import sys
+from . import namespace
+from . import props
+from . import refs
+from . import collapse
+
+# Maximum estimated memory of a tree, as a multiple of the file size.
+# Building a tree which exceeds this raises TreeSizeError.  Documents made
+# mostly of tiny elements can exceed it, and must be cleaned by streaming.
+MEMORY_FACTOR = 3
+
+# Memory which any tree may use, regardless of file size
+MEMORY_FLOOR = 1 << 20
+
+class TreeSizeError(Exception):
+	pass
+
+class Node(object):
+	'''Element node.  Attributes are a flat tuple of names and values;
+	children are a tuple of nodes, text, comments and CDATA sections (or
+	None).  The index is the byte index of the start tag, if recorded.'''
+	__slots__ = ('name', 'attrs', 'children', 'index')
+
+	def __init__(self, name, attrs, index):
+		self.name = name
+		self.attrs = attrs
+		self.children = None
+		self.index = index
+
+	def local_name(self):
+		return self.name.split(':')[-1]
+
+	def items(self):
+		a = self.attrs
+		return zip(a[::2], a[1::2])
+
+	def get(self, attr):
+		a = self.attrs
+		for i in range(0, len(a), 2):
+			if a[i] == attr:
+				return a[i + 1]
+
+	def remove(self, attr):
+		flat = []
+		for n, v in self.items():
+			if n != attr:
+				flat.append(n)
+				flat.append(v)
+		self.attrs = tuple(flat)
+
+	def attr_dict(self):
+		return dict(self.items())
+
+	def nodes(self):
+		'Get the child element nodes'
+		return [c for c in self.children or () if isinstance(c, Node)]
+
+class Comment(object):
+	__slots__ = ('data',)
+
+	def __init__(self, data):
+		self.data = data
+
+class CData(object):
+	__slots__ = ('chunks',)
+
+	def __init__(self):
+		self.chunks = []
+
+class Document(object):
+
+	def __init__(self):
+		self.xml = None
+		self.doctype = None
+		self.children = []
+		self.root = None
+
+# Attributes with values which are shared by all nodes
+_SHARED = frozenset(('style', 'class', 'transform') + props.NAMES)
+
+_NODE_SIZE = sys.getsizeof(Node(None, (), None))
+_TUPLE_SIZE = sys.getsizeof(())
+_STR_SIZE = sys.getsizeof('')
+_REF_SIZE = sys.getsizeof((None,)) - _TUPLE_SIZE
+
+class TreeBuilder(object):
+	'''Builder of a document tree from expat events.  Names and shared
+	attribute values are interned, and memory is estimated as the tree
+	is built.'''
+
+	def __init__(self, limit, indexed, expat):
+		self.limit = limit
+		self.indexed = indexed
+		self.doc = Document()
+		self.stack = []
+		self.values = {}
+		self.size = 0
+		self.cdata = None
+		if expat:
+			self.spaces = namespace.ExpatNamespaces()
+			self.parser = ParserCreate(
+				namespace_separator=namespace.SEPARATOR)
+			self.parser.StartNamespaceDeclHandler = \
+				self.spaces.start_decl
+			self.parser.EndNamespaceDeclHandler = \
+				self.spaces.end_decl
+		else:
+			self.spaces = None
+			self.parser = ParserCreate()
+		self.parser.XmlDeclHandler = self.xml_decl
+		self.parser.StartDoctypeDeclHandler = self.start_doctype_decl
+		self.parser.CommentHandler = self.comment
+		self.parser.StartElementHandler = self.start_element
+		self.parser.EndElementHandler = self.end_element
+		self.parser.CharacterDataHandler = self.character_data
+		self.parser.StartCdataSectionHandler = self.start_cdata_section
+		self.parser.EndCdataSectionHandler = self.end_cdata_section
+
+	def _add_size(self, size):
+		self.size += size
+		if self.size > self.limit:
+			raise TreeSizeError(self.size)
+
+	def _string(self, value):
+		self._add_size(_STR_SIZE + len(value))
+		return value
+
+	def _value(self, name, value):
+		if name in _SHARED:
+			v = self.values.get(value)
+			if v is None:
+				v = self.values[value] = self._string(value)
+			return v
+		return self._string(value)
+
+	def _append(self, item):
+		if self.stack:
+			self.stack[-1][1].append(item)
+		else:
+			self.doc.children.append(item)
+
+	def xml_decl(self, version, encoding, standalone):
+		self.doc.xml = (version, encoding, standalone)
+
+	def start_doctype_decl(self, doctype, system_id, public_id,
+	    has_internal_subset):
+		self.doc.doctype = (doctype, system_id, public_id,
+			has_internal_subset)
+
+	def comment(self, data):
+		self._append(Comment(self._string(data)))
+
+	def start_element(self, name, attrs):
+		if self.spaces:
+			name = self.spaces.qualify(name)
+			attrs = self.spaces.qualify_attrs(attrs)
+			self.spaces.enter(attrs)
+		flat = []
+		for a in attrs:
+			flat.append(sys.intern(a))
+			flat.append(self._value(a, attrs[a]))
+		index = self.parser.CurrentByteIndex if self.indexed else None
+		node = Node(sys.intern(name), tuple(flat), index)
+		self._add_size(_NODE_SIZE)
+		if flat:
+			self._add_size(_TUPLE_SIZE + _REF_SIZE * len(flat))
+		self._append(node)
+		self.stack.append((node, []))
+		if self.doc.root is None:
+			self.doc.root = node
+
+	def end_element(self, name):
+		node, children = self.stack.pop()
+		if children:
+			node.children = tuple(children)
+			self._add_size(_TUPLE_SIZE + _REF_SIZE * len(children))
+		if self.spaces:
+			self.spaces.exit()
+
+	def character_data(self, data):
+		data = data.strip()
+		if not data:
+			return
+		if self.cdata is not None:
+			self.cdata.chunks.append(self._string(data))
+		else:
+			self._append(self._string(data))
+
+	def start_cdata_section(self):
+		self.cdata = CData()
+		self._add_size(_NODE_SIZE)
+		self._append(self.cdata)
+
+	def end_cdata_section(self):
+		self.cdata = None
+
+	def build(self, f):
+		self.parser.ParseFile(f)
+		return self.doc
+
+def build(f, size, indexed=False, expat=False):
+	'''Build a document tree from a file.  Raises TreeSizeError if the
+	tree would take more than MEMORY_FACTOR times the file size.'''
+	limit = max(MEMORY_FACTOR * size, MEMORY_FLOOR)
+	return TreeBuilder(limit, indexed, expat).build(f)
+
+def walk(node):
+	'Iterate over the element nodes of a tree, in document order'
+	stack = [node]
+	while stack:
+		n = stack.pop()
+		yield n
+		stack.extend(reversed(n.nodes()))
+
+def references(doc):
+	'''Get the set of all referenced ids in a document, or None if any id
+	might be referenced (by a script)'''
+	ids = set()
+	for node in walk(doc.root):
+		name = node.local_name()
+		if name in refs.OPAQUE:
+			return None
+		for a, v in node.items():
+			ids.update(refs.attr_refs(a, v))
+		if name == 'style':
+			for c in node.children or ():
+				if isinstance(c, CData):
+					c = ''.join(c.chunks)
+				if isinstance(c, str):
+					ids.update(refs.text_refs(c))
+	return ids
+
+def _is_referenced(node, ids):
+	for n in walk(node):
+		ident = n.get('id')
+		if ident is not None and (ids is None or ident in ids):
+			return True
+	return False
+
+def remove_unused_ids(doc, ids):
+	'Remove unreferenced ids (except on the root element)'
+	for node in walk(doc.root):
+		ident = node.get('id')
+		if node is not doc.root and ident is not None and \
+		   ident not in ids:
+			node.remove('id')
+
+def _is_unused_def(c, ids):
+	return isinstance(c, Node) and c.local_name() in refs.BY_ID and \
+		not _is_referenced(c, ids)
+
+def remove_unused_defs(doc, ids):
+	'Remove children of defs elements which are never referenced'
+	for node in walk(doc.root):
+		if node.local_name() == 'defs' and node.children:
+			children = tuple(c for c in node.children
+				if not _is_unused_def(c, ids))
+			node.children = children or None
+
+def _is_empty(node, ids):
+	return node.local_name() in collapse.CONTAINERS and \
+		not node.children and not _is_referenced(node, ids)
+
+def remove_empty_groups(doc, ids):
+	'''Remove container elements which have no children (after removing
+	their empty children)'''
+	for node in reversed(list(walk(doc.root))):
+		if node.children:
+			children = tuple(c for c in node.children
+				if not (isinstance(c, Node) and
+				_is_empty(c, ids)))
+			node.children = children or None